@@ -0,0 +1,297 @@
+"""Метрики представлений: время, SQL, шаблоны и кеш.
+
+TimingMiddleware снимает метрики с доли запросов (METRICS_SAMPLE_RATE),
+чтобы под нагрузкой накладные расходы оставались малыми. На выбранных
+запросах считаются время ответа, число и время SQL-запросов, время
+рендеринга шаблонов и попадания в кеш 'default'; итог уходит в
+счётчики для /metrics/ в формате Prometheus и, при METRICS_SERVER_TIMING,
+в заголовок Server-Timing.
+
+Счётчики живут в памяти процесса: при нескольких воркерах каждый
+отдаёт свои, а Prometheus складывает их по меткам.
+
+Замер текущего запроса хранится в contextvars, а не в threading.local:
+под ASGI он доходит и до потоков sync_to_async, где выполняются запросы
+к БД и рендеринг (см. collect()).
+"""
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.db import connections
+from django.template.backends import django as django_backend
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+_current = contextvars.ContextVar('request_timings', default=None)
+_lock = threading.Lock()
+_views = {}
+_MISSING = object()
+
+
+class RequestTimings:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.total = 0
+        self.db_queries = 0
+        self.db_time = 0
+        self.template_time = 0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper для всех соединений с БД
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            # под ASGI запросы одного замера идут из нескольких потоков
+            with self.lock:
+                self.db_queries += 1
+                self.db_time += time.perf_counter() - started
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def server_timing(self):
+        return ', '.join((
+            'total;dur=%.1f' % (self.total * 1000),
+            'db;dur=%.1f;desc="%s SQL"' % (
+                self.db_time * 1000, self.db_queries
+            ),
+            'tpl;dur=%.1f' % (self.template_time * 1000),
+            'cache;desc="hit %s miss %s"' % (
+                self.cache_hits, self.cache_misses
+            ),
+        ))
+
+
+class ViewStats:
+    def __init__(self):
+        self.requests = 0
+        self.seconds = 0
+        self.buckets = [0] * len(BUCKETS)
+        self.db_queries = 0
+        self.db_seconds = 0
+        self.template_seconds = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add(self, timings):
+        self.requests += 1
+        self.seconds += timings.total
+        index = bisect_left(BUCKETS, timings.total)
+        if index < len(BUCKETS):
+            self.buckets[index] += 1
+        self.db_queries += timings.db_queries
+        self.db_seconds += timings.db_time
+        self.template_seconds += timings.template_time
+        self.cache_hits += timings.cache_hits
+        self.cache_misses += timings.cache_misses
+
+
+def current():
+    """Замеры текущего запроса или None, если он не попал в выборку."""
+    return _current.get()
+
+
+def record(view_name, timings):
+    with _lock:
+        _views.setdefault(view_name, ViewStats()).add(timings)
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+def _timed_render(render):
+    def wrapper(self, *args, **kwargs):
+        timings = current()
+        if timings is None or timings.template_depth:
+            # вложенные render_to_string уже учтены внешним замером
+            return render(self, *args, **kwargs)
+        timings.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            timings.template_time += time.perf_counter() - started
+            timings.template_depth -= 1
+    wrapper.timed = True
+    return wrapper
+
+
+def instrument_templates():
+    """Оборачивает рендеринг шаблонов Django (один раз на процесс)."""
+    template_class = django_backend.Template
+    if not getattr(template_class.render, 'timed', False):
+        template_class.render = _timed_render(template_class.render)
+
+
+def instrument_cache():
+    """Считает попадания в кеш 'default' текущего потока.
+
+    Экземпляры бэкендов у Django свои в каждом потоке, поэтому
+    методы подменяются у экземпляра, а не у класса.
+    """
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    if getattr(backend, '_timed', False):
+        return
+    get, get_many = backend.get, backend.get_many
+
+    def timed_get(key, default=None, version=None):
+        value = get(key, _MISSING, version=version)
+        timings = current()
+        if timings is not None:
+            if value is _MISSING:
+                timings.cache_misses += 1
+            else:
+                timings.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def timed_get_many(keys, version=None):
+        keys = list(keys)
+        found = get_many(keys, version=version)
+        timings = current()
+        if timings is not None:
+            timings.cache_hits += len(found)
+            timings.cache_misses += len(keys) - len(found)
+        return found
+
+    backend.get, backend.get_many = timed_get, timed_get_many
+    backend._timed = True
+
+
+@contextmanager
+def collect(timings):
+    """Подключает замер к соединениям с БД и кешу текущего потока."""
+    instrument_cache()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timings))
+        yield
+
+
+class TimingMiddleware:
+    """Снимает метрики с доли запросов; ставить первым в MIDDLEWARE.
+
+    Работает и под WSGI, и под ASGI: в асинхронной цепочке не заставляет
+    Django переключать её в синхронный режим.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # так Django распознаёт асинхронный экземпляр middleware
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        instrument_templates()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            with collect(timings):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        timings.finish()
+        match = request.resolver_match
+        record(match.view_name if match else '<unresolved>', timings)
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = timings.server_timing()
+        return response
+
+
+def _line(name, labels, value):
+    label_text = ','.join(
+        '%s="%s"' % (key, str(label).replace('\\', '\\\\').replace('"', '\\"'))
+        for key, label in labels.items()
+    )
+    return '%s{%s} %s' % (name, label_text, value)
+
+
+def render_prometheus():
+    """Счётчики всех представлений в текстовом формате Prometheus."""
+    with _lock:
+        views = {
+            name: dict(vars(stats), buckets=list(stats.buckets))
+            for name, stats in _views.items()
+        }
+    lines = [
+        '# HELP yatube_metrics_sample_rate Доля запросов в выборке.',
+        '# TYPE yatube_metrics_sample_rate gauge',
+        'yatube_metrics_sample_rate %s' % settings.METRICS_SAMPLE_RATE,
+    ]
+    counters = (
+        ('yatube_view_db_queries_total', 'db_queries', 'SQL-запросы.'),
+        ('yatube_view_db_seconds_total', 'db_seconds', 'Время SQL.'),
+        ('yatube_view_template_seconds_total', 'template_seconds',
+         'Время рендеринга шаблонов.'),
+        ('yatube_view_cache_hits_total', 'cache_hits', 'Попадания в кеш.'),
+        ('yatube_view_cache_misses_total', 'cache_misses', 'Промахи кеша.'),
+    )
+    lines += [
+        '# HELP yatube_view_seconds Время ответа представления.',
+        '# TYPE yatube_view_seconds histogram',
+    ]
+    for name, stats in sorted(views.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS, stats['buckets']):
+            cumulative += count
+            lines.append(_line(
+                'yatube_view_seconds_bucket', {'view': name, 'le': bound},
+                cumulative,
+            ))
+        lines.append(_line(
+            'yatube_view_seconds_bucket', {'view': name, 'le': '+Inf'},
+            stats['requests'],
+        ))
+        lines.append(_line(
+            'yatube_view_seconds_sum', {'view': name}, stats['seconds']
+        ))
+        lines.append(_line(
+            'yatube_view_seconds_count', {'view': name}, stats['requests']
+        ))
+    for metric, field, help_text in counters:
+        lines += [
+            '# HELP %s %s' % (metric, help_text),
+            '# TYPE %s counter' % metric,
+        ]
+        lines += [
+            _line(metric, {'view': name}, stats[field])
+            for name, stats in sorted(views.items())
+        ]
+    return '\n'.join(lines) + '\n'
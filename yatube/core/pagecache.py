@@ -0,0 +1,140 @@
+"""Кеш целых страниц для анонимных посетителей.
+
+AnonymousPageCacheMiddleware отдаёт из кеша любую публичную страницу
+(ленты, профиль, пост, «Об авторе»), если запрос анонимный: GET или
+HEAD без куки сессии и сообщений. Ключ — хост, путь и строка запроса
+(?page=, ?after= и т. п.) вместе с версией кеша страниц.
+
+Версию поднимает любое сохранение и удаление моделей PAGE_CACHE_MODELS,
+так что новая запись сразу видна всем; вход пользователя (запись
+last_login) версию не трогает.
+
+Ответ попадает в кеш, только если он одинаков для всех: код 200,
+без Set-Cookie (в том числе куки CSRF — страница с формой всегда её
+ставит), без Cache-Control private/no-cache/no-store и Vary только по
+Cookie. Пути PAGE_CACHE_EXCLUDE (админка, /metrics/) не кешируются.
+При DEBUG кеш не работает, чтобы не раздавать страницы с debug_toolbar.
+"""
+import hashlib
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.urls import Resolver404, resolve
+from django.utils.cache import cc_delim_re, get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+PAGE_VERSION_KEY = 'core:page_version'
+# записи этих полей на страницах не видны
+IGNORED_FIELDS = {'last_login'}
+BYPASS_COOKIES = ('messages',)
+PRIVATE_DIRECTIVES = {'private', 'no-cache', 'no-store'}
+
+
+def get_page_version():
+    version = cache.get(PAGE_VERSION_KEY)
+    if version is None:
+        cache.add(PAGE_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(PAGE_VERSION_KEY, 1)
+    return version
+
+
+def bump_page_version():
+    """Делает устаревшими все закешированные страницы."""
+    try:
+        cache.incr(PAGE_VERSION_KEY)
+    except ValueError:
+        cache.set(PAGE_VERSION_KEY, int(time.time() * 1000), None)
+
+
+def model_changed(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and set(update_fields) <= IGNORED_FIELDS):
+        return
+    bump_page_version()
+
+
+def connect_signals():
+    for label in settings.PAGE_CACHE_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(
+            model_changed, sender=model,
+            dispatch_uid='page_cache_save_%s' % label,
+        )
+        post_delete.connect(
+            model_changed, sender=model,
+            dispatch_uid='page_cache_delete_%s' % label,
+        )
+
+
+def page_key(request):
+    query = sorted(request.GET.lists())
+    url = '%s%s?%s' % (request.get_host(), request.path, query)
+    return 'core:page:%s:%s' % (
+        get_page_version(), hashlib.md5(url.encode()).hexdigest()
+    )
+
+
+def is_cacheable_request(request):
+    if not settings.PAGE_CACHE or settings.DEBUG:
+        return False
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if any(name in request.COOKIES
+           for name in (settings.SESSION_COOKIE_NAME, *BYPASS_COOKIES)):
+        return False
+    return not request.path.startswith(tuple(settings.PAGE_CACHE_EXCLUDE))
+
+
+def _header_values(response, header):
+    return {
+        value.split('=')[0].strip().lower()
+        for value in cc_delim_re.split(response.get(header, ''))
+        if value
+    }
+
+
+def is_cacheable_response(request, response):
+    if response.status_code != 200 or response.streaming:
+        return False
+    if response.cookies or request.META.get('CSRF_COOKIE_USED'):
+        return False
+    if _header_values(response, 'Cache-Control') & PRIVATE_DIRECTIVES:
+        return False
+    if _header_values(response, 'Vary') - {'cookie'}:
+        return False
+    user = getattr(request, 'user', None)
+    return user is None or not user.is_authenticated
+
+
+def conditional(request, response):
+    """304 для кешированной страницы, если у браузера она уже есть."""
+    return get_conditional_response(
+        request,
+        etag=response.get('ETag'),
+        last_modified=parse_http_date_safe(response.get('Last-Modified', '')),
+        response=response,
+    )
+
+
+class AnonymousPageCacheMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_cacheable_request(request):
+            return self.get_response(request)
+        key = page_key(request)
+        response = cache.get(key)
+        if response is not None:
+            try:
+                # чтобы метрики записали попадание на своё представление
+                request.resolver_match = resolve(request.path_info)
+            except Resolver404:
+                pass
+            return conditional(request, response)
+        response = self.get_response(request)
+        if is_cacheable_response(request, response):
+            cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+        return response
@@ -0,0 +1,243 @@
+import asyncio
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from core import metrics
+from core.pagecache import get_page_version
+from core.caches import TieredCache
+from posts import async_views
+from posts.models import Group, Post
+
+SHARED_CACHE_DIR = tempfile.mkdtemp()
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': SHARED_CACHE_DIR,
+    },
+})
+class TieredCacheTest(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(SHARED_CACHE_DIR, ignore_errors=True)
+
+    def make_worker(self, max_entries=100):
+        """Кеш отдельного воркера: свой L1, общий файловый L2."""
+        self.workers += 1
+        return TieredCache('worker-%s' % self.workers, {'OPTIONS': {
+            'SHARED_CACHE': 'shared',
+            'MAX_ENTRIES': max_entries,
+            'LOCAL_TIMEOUT': 60,
+        }})
+
+    def setUp(self):
+        self.workers = 0
+        caches['shared'].clear()
+
+    def test_workers_share_second_level(self):
+        """Запись одного воркера видна другому через общий кеш."""
+        first, second = self.make_worker(), self.make_worker()
+        first.set('key', {'value': 1})
+        self.assertEqual(second.get('key'), {'value': 1})
+        self.assertEqual(second.get_many(['key', 'missing']),
+                         {'key': {'value': 1}})
+
+    def test_first_level_serves_repeated_reads(self):
+        """Повторное чтение идёт из памяти процесса."""
+        worker = self.make_worker()
+        worker.set('key', 'value')
+        caches['shared'].delete('key')
+        self.assertEqual(worker.get('key'), 'value')
+        worker.delete('key')
+        self.assertIsNone(worker.get('key'))
+
+    def test_first_level_is_bounded_lru(self):
+        """L1 вытесняет давно не читанные ключи."""
+        worker = self.make_worker(max_entries=2)
+        worker.set('a', 1)
+        worker.set('b', 2)
+        worker.get('a')
+        worker.set('c', 3)
+        caches['shared'].clear()
+        self.assertEqual(worker.get('a'), 1)
+        self.assertEqual(worker.get('c'), 3)
+        self.assertIsNone(worker.get('b'))
+
+    def test_incr_goes_to_shared_level(self):
+        """incr не оставляет в L1 устаревшего значения."""
+        first, second = self.make_worker(), self.make_worker()
+        first.set('version', 1)
+        self.assertEqual(second.get('version'), 1)
+        self.assertEqual(second.incr('version'), 2)
+        self.assertEqual(second.get('version'), 2)
+        self.assertTrue(first.add('other', 1))
+        self.assertFalse(second.add('other', 2))
+
+
+@override_settings(METRICS_SAMPLE_RATE=1, METRICS_SERVER_TIMING=True)
+class MetricsTest(TestCase):
+    def setUp(self):
+        metrics.reset()
+        cache.clear()
+        author = get_user_model().objects.create_user(username='author')
+        self.post = Post.objects.create(author=author, text='Пост')
+
+    def test_server_timing(self):
+        """Выбранный запрос получает Server-Timing с SQL и шаблонами."""
+        response = Client().get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        timing = response['Server-Timing']
+        for part in ('total;dur=', 'db;dur=', 'tpl;dur=', 'cache;desc='):
+            self.assertIn(part, timing)
+        stats = metrics._views['posts:post_detail']
+        self.assertEqual(stats.requests, 1)
+        self.assertGreater(stats.db_queries, 0)
+        self.assertGreater(stats.template_seconds, 0)
+
+    def test_cache_hits_counted(self):
+        """Повторный запрос ленты попадает в кеш страниц."""
+        client = Client()
+        client.get(reverse('posts:index'))
+        client.get(reverse('posts:index'))
+        stats = metrics._views['posts:index']
+        self.assertEqual(stats.requests, 2)
+        self.assertGreater(stats.cache_hits, 0)
+        self.assertGreater(stats.cache_misses, 0)
+
+    @override_settings(METRICS_SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        """Без METRICS_SERVER_TIMING замер идёт только в /metrics/."""
+        response = Client().get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(metrics._views['posts:post_detail'].requests, 1)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        response = Client().get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(metrics._views, {})
+
+    def test_async_middleware(self):
+        """Под ASGI замер доходит до потоков sync_to_async."""
+        async def view(request):
+            await async_views.run(lambda: cache.get('missing'))
+            return HttpResponse()
+
+        middleware = metrics.TimingMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = asyncio.run(middleware(RequestFactory().get('/')))
+        self.assertIn('cache;desc="hit 0 miss 1"', response['Server-Timing'])
+        self.assertEqual(metrics._views['<unresolved>'].cache_misses, 1)
+
+    def test_prometheus_endpoint(self):
+        """/metrics/ отдаёт гистограмму и счётчики по представлениям."""
+        Client().get(reverse('posts:index'))
+        response = Client().get(reverse('metrics'))
+        text = response.content.decode()
+        self.assertIn('yatube_view_seconds_count{view="posts:index"} 1', text)
+        self.assertIn(
+            'yatube_view_seconds_bucket{view="posts:index",le="+Inf"} 1', text
+        )
+        self.assertIn('yatube_view_db_queries_total{view="posts:index"}', text)
+        response = Client(REMOTE_ADDR='192.0.2.1').get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
+
+
+class SqliteTuningTest(TestCase):
+    def test_pragmas_applied(self):
+        """Новое соединение с SQLite получает PRAGMA из настроек."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('только для SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(
+                cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout']
+            )
+
+
+@override_settings(PAGE_CACHE=True)
+class PageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = get_user_model().objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.author, text='Первый пост', group=self.group
+        )
+        self.url = reverse('posts:group_list', args=[self.group.slug])
+
+    def test_anonymous_page_served_from_cache(self):
+        """Повторный анонимный запрос не обращается к БД."""
+        first = Client().get(self.url)
+        with self.assertNumQueries(0):
+            second = Client().get(self.url)
+        self.assertEqual(first.content, second.content)
+
+    def test_page_parameter_in_key(self):
+        """Разные страницы ленты кешируются отдельно."""
+        Client().get(self.url)
+        response = Client().get(self.url, {'page': 2})
+        self.assertIsNotNone(response.context)
+
+    def test_model_change_resets_cache(self):
+        """Новый пост сразу виден в закешированной ленте."""
+        Client().get(self.url)
+        Post.objects.create(
+            author=self.author, text='Второй пост', group=self.group
+        )
+        self.assertContains(Client().get(self.url), 'Второй пост')
+
+    def test_login_does_not_reset_cache(self):
+        """Запись last_login при входе не сбрасывает кеш страниц."""
+        self.author.set_password('password-123')
+        self.author.save()
+        version = get_page_version()
+        Client().login(username='author', password='password-123')
+        self.assertEqual(get_page_version(), version)
+
+    def test_logged_in_bypass(self):
+        """Авторизованный пользователь всегда получает свою страницу."""
+        Client().get(self.url)
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(reverse('posts:post_detail', args=[
+            self.post.pk
+        ]))
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        response = client.get(self.url)
+        self.assertIsNotNone(response.context)
+
+    def test_csrf_form_not_cached(self):
+        """Страница с формой и кукой CSRF не кешируется."""
+        url = reverse('users:login')
+        Client().get(url)
+        response = Client().get(url)
+        self.assertIsNotNone(response.context)
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+
+    def test_conditional_get_from_cache(self):
+        """Закешированная страница отвечает 304 на If-None-Match."""
+        etag = Client().get(self.url)['ETag']
+        response = Client().get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,135 @@
+"""JSON API только для чтения: ленты, пост и комментарии.
+
+Строки выбираются через .values() только с нужными полями, без
+экземпляров моделей и шаблонов; страницы — курсорные (?after=, ?before=,
+?limit=). Ответ — компактный JSON:
+{"results": [...], "next": курсор или null, "previous": курсор или null}.
+"""
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.views.decorators.http import condition, require_GET
+
+from . import timeline
+from .caching import (feed_etag, feed_last_modified, post_etag,
+                      post_last_modified)
+from .models import Comment, Group, Post, User
+from .paginators import CursorPaginator
+
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'author__username', 'group__slug', 'image',
+    'comments_count',
+)
+COMMENT_FIELDS = ('id', 'author__username', 'text', 'created')
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={
+        'ensure_ascii': False, 'separators': (',', ':'),
+    })
+
+
+def error(detail, status):
+    return json_response({'detail': detail}, status=status)
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get('limit', settings.SHOWED_POSTS))
+    except ValueError:
+        limit = settings.SHOWED_POSTS
+    return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+
+def serialize_post(row):
+    image = row['image']
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': row['author__username'],
+        'group': row['group__slug'],
+        'image': default_storage.url(image) if image else None,
+        'comments_count': row['comments_count'],
+    }
+
+
+def serialize_comment(row):
+    return {
+        'id': row['id'],
+        'author': row['author__username'],
+        'text': row['text'],
+        'created': row['created'],
+    }
+
+
+def paginated(request, queryset, fields, serialize, ordering):
+    paginator = CursorPaginator(
+        queryset.values(*fields), page_size(request), ordering=ordering
+    )
+    page = paginator.page_for(
+        after=request.GET.get('after'), before=request.GET.get('before')
+    )
+    return json_response({
+        'results': [serialize(row) for row in page],
+        'next': page.next_cursor(),
+        'previous': page.previous_cursor(),
+    })
+
+
+def post_page(request, queryset):
+    return paginated(
+        request, queryset, POST_FIELDS, serialize_post, ('-pub_date', '-id')
+    )
+
+
+@require_GET
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def index(request):
+    return post_page(request, Post.objects.all())
+
+
+@require_GET
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def group_posts(request, slug):
+    if not Group.objects.filter(slug=slug).exists():
+        return error('Группа не найдена.', 404)
+    return post_page(request, Post.objects.filter(group__slug=slug))
+
+
+@require_GET
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def profile_posts(request, username):
+    if not User.objects.filter(username=username).exists():
+        return error('Пользователь не найден.', 404)
+    return post_page(
+        request, Post.objects.filter(author__username=username)
+    )
+
+
+@require_GET
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def follow_posts(request):
+    if not request.user.is_authenticated:
+        return error('Нужна авторизация.', 401)
+    return post_page(request, timeline.following_posts(request.user))
+
+
+@require_GET
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
+def post_detail(request, post_id):
+    row = Post.objects.filter(pk=post_id).values(*POST_FIELDS).first()
+    if row is None:
+        return error('Пост не найден.', 404)
+    return json_response(serialize_post(row))
+
+
+@require_GET
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return error('Пост не найден.', 404)
+    return paginated(
+        request, Comment.objects.filter(post_id=post_id), COMMENT_FIELDS,
+        serialize_comment, ('created', 'id'),
+    )
@@ -3,3 +3,13 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from django.conf import settings
+        from PIL import Image
+
+        from . import signals  # noqa: F401
+
+        # Pillow и при загрузке, и при построении миниатюр
+        # отказывается открывать картинки больше лимита
+        Image.MAX_IMAGE_PIXELS = settings.POST_IMAGE_MAX_PIXELS
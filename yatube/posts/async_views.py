@@ -0,0 +1,210 @@
+"""Асинхронные версии страниц только для чтения (ASGI, Django 3.1+).
+
+Независимые обращения к кешу и к БД идут одновременно: каждое — в
+своём потоке через sync_to_async(thread_sensitive=False), со своим
+соединением с БД (держите CONN_MAX_AGE > 0, чтобы потоки их не
+переоткрывали). Так страница ждёт самый долгий запрос, а не их сумму.
+Шаблоны и контекст те же, что у posts.views.
+
+Подключаются в posts/urls.py при ASYNC_VIEWS (его включает yatube/asgi.py).
+Страничный кеш cache_page с async-представлениями не работает —
+остаются ETag и кеш фрагментов в шаблонах.
+"""
+import asyncio
+from calendar import timegm
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.shortcuts import get_object_or_404, render
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from core import metrics
+
+from .caching import (feed_cache_context, feed_etag, feed_last_modified,
+                      post_etag, post_last_modified)
+from . import spool
+from .forms import CommentForm
+from .models import Group, Post, User, get_user_stats
+from .paginators import CountedPaginator, CursorPaginator
+from .views import get_comments_page
+
+
+def _call(func, args, kwargs):
+    close_old_connections()
+    try:
+        timings = metrics.current()
+        if timings is None:
+            return func(*args, **kwargs)
+        with metrics.collect(timings):
+            return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run(func, *args, **kwargs):
+    """Выполняет синхронный код (ORM, кеш, шаблоны) в отдельном потоке."""
+    return await sync_to_async(_call, thread_sensitive=False)(
+        func, args, kwargs
+    )
+
+
+def _validators(request, etag_func, last_modified_func, args, kwargs):
+    etag = etag_func(request, *args, **kwargs)
+    last_modified = last_modified_func(request, *args, **kwargs)
+    return (
+        quote_etag(etag) if etag is not None else None,
+        timegm(last_modified.utctimetuple()) if last_modified else None,
+    )
+
+
+def condition(etag_func, last_modified_func):
+    """Аналог django.views.decorators.http.condition для async-представлений.
+
+    Штатный декоратор вызывает представление синхронно и с корутиной
+    не работает.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            etag, last_modified = await run(
+                _validators, request, etag_func, last_modified_func,
+                args, kwargs,
+            )
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response['Last-Modified'] = http_date(last_modified)
+                if etag and not response.has_header('ETag'):
+                    response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
+
+
+async def get_page_context(queryset, request, count=None, count_key=None):
+    """То же, что views.get_page_context; первая страница выбирается
+    одновременно с числом записей."""
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if settings.POSTS_CURSOR_PAGINATION or after or before:
+        paginator = CursorPaginator(queryset, settings.SHOWED_POSTS)
+        page_obj = await run(
+            lambda: paginator.page_for(after=after, before=before)
+        )
+        return {
+            'paginator': paginator,
+            'page_number': None,
+            'page_obj': page_obj,
+        }
+    paginator = CountedPaginator(
+        queryset, settings.SHOWED_POSTS, count=count, count_key=count_key
+    )
+    page_number = request.GET.get('page')
+    if page_number in (None, '', '1'):
+        # первая страница есть всегда, её не нужно сверять с числом страниц
+        count, object_list = await asyncio.gather(
+            run(lambda: paginator.count),
+            run(list, queryset[:paginator.per_page]),
+        )
+        paginator.count = count
+        page_obj = paginator._get_page(object_list, 1, paginator)
+    else:
+        # номер сверяется с числом страниц до выборки, как в
+        # Paginator.get_page: чужой номер не превращается в глубокий OFFSET
+        await run(lambda: paginator.count)
+        page_obj = paginator.get_page(page_number)
+        page_obj.object_list = await run(list, page_obj.object_list)
+    return {
+        'paginator': paginator,
+        'page_number': page_number,
+        'page_obj': page_obj,
+    }
+
+
+@condition(feed_etag, feed_last_modified)
+async def index(request):
+    posts = Post.objects.select_related('author', 'group')
+    page_context, cache_context = await asyncio.gather(
+        get_page_context(posts, request, count_key='index'),
+        run(feed_cache_context),
+    )
+    context = {**page_context, **cache_context}
+    return await run(render, request, 'posts/index.html', context)
+
+
+@condition(feed_etag, feed_last_modified)
+async def group_posts(request, slug):
+    # группа и её посты выбираются параллельно: посты — по slug
+    posts = Post.objects.filter(group__slug=slug).select_related(
+        'author', 'group'
+    )
+    group, page_context = await asyncio.gather(
+        run(get_object_or_404, Group, slug=slug),
+        get_page_context(posts, request, count_key='group:%s' % slug),
+    )
+    context = {
+        'group': group,
+        'posts': posts,
+    }
+    context.update(page_context)
+    return await run(render, request, 'posts/group_list.html', context)
+
+
+def _author_with_stats(username):
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    return author, get_user_stats(author)
+
+
+@condition(feed_etag, feed_last_modified)
+async def profile(request, username):
+    # число постов берётся из UserStats, как в posts.views.profile,
+    # поэтому страница выбирается после автора
+    author, stats = await run(_author_with_stats, username)
+    posts = author.posts.select_related('author', 'group')
+    following, page_context = await asyncio.gather(
+        run(spool.is_following, request.user, author),
+        get_page_context(posts, request, count=stats.posts_count),
+    )
+    context = {
+        'author': author,
+        'following': following,
+        'posts_count': stats.posts_count,
+        'followers_count': stats.followers_count,
+        'following_count': stats.following_count,
+    }
+    context.update(page_context)
+    return await run(render, request, 'posts/profile.html', context)
+
+
+def _post_with_stats(post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
+    return post, get_user_stats(post.author)
+
+
+@condition(post_etag, post_last_modified)
+async def post_detail(request, post_id):
+    (post, stats), comments, pending = await asyncio.gather(
+        run(_post_with_stats, post_id),
+        run(get_comments_page, post_id, request),
+        run(spool.pending_comments, request.user, post_id),
+    )
+    context = {
+        'post': post,
+        'group': post.group,
+        'posts_count': stats.posts_count,
+        'form': CommentForm(),
+        'comments': comments,
+        'pending_comments': pending,
+    }
+    return await run(render, request, 'posts/post_detail.html', context)
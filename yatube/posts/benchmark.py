@@ -0,0 +1,347 @@
+"""Нагрузочный прогон лент и страниц поста.
+
+seed() заполняет базу правдоподобными данными (тексты — Faker),
+run() прогоняет представления через тестовый клиент и считает для
+каждого задержку (p50/p95/p99), число SQL-запросов и размер ответа.
+run_http() нагружает уже запущенный сервер по HTTP из многих соединений
+сразу — так сравниваются WSGI (gunicorn) и ASGI (uvicorn).
+Запускается командой benchmark, результат пишется в JSON.
+"""
+import http.client
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from faker import Faker
+
+from . import spool
+from .models import Comment, Follow, Group, Post, User
+from .transfer import bulk_create_batches, rebuild_derived
+
+
+def seed(users=100, groups=10, posts=5000, comments=10000, follows=1000,
+         seed_value=0):
+    """Заполняет базу и пересчитывает всё, что обычно ведут сигналы.
+
+    Записи создаются через bulk_create, поэтому счётчики, поисковый
+    индекс и ленты подписок пересобираются в конце одним проходом.
+    """
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed_value)
+    rand = random.Random(seed_value)
+
+    bulk_create_batches(User, (
+        User(username='bench_%s' % i, first_name=fake.first_name(),
+             last_name=fake.last_name())
+        for i in range(users)
+    ))
+    user_ids = list(User.objects.filter(
+        username__startswith='bench_'
+    ).values_list('pk', flat=True))
+    bulk_create_batches(Group, (
+        Group(title=fake.catch_phrase()[:200], slug='bench-%s' % i,
+              description=fake.paragraph())
+        for i in range(groups)
+    ))
+    group_ids = list(Group.objects.filter(
+        slug__startswith='bench-'
+    ).values_list('pk', flat=True))
+
+    # часть постов без группы
+    group_choices = group_ids + [None]
+    bulk_create_batches(Post, (
+        Post(author_id=rand.choice(user_ids),
+             group_id=rand.choice(group_choices),
+             text=fake.text(max_nb_chars=rand.randint(100, 1500)))
+        for _ in range(posts)
+    ))
+    post_ids = list(Post.objects.filter(
+        author_id__in=user_ids
+    ).values_list('pk', flat=True))
+    bulk_create_batches(Comment, (
+        Comment(post_id=rand.choice(post_ids),
+                author_id=rand.choice(user_ids),
+                text=fake.sentence(nb_words=rand.randint(3, 30)))
+        for _ in range(comments)
+    ))
+    pairs = set()
+    while len(pairs) < min(follows, users * (users - 1)):
+        user_id, author_id = rand.sample(user_ids, 2)
+        pairs.add((user_id, author_id))
+    bulk_create_batches(Follow, (
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in pairs
+    ))
+
+    rebuild_derived()
+
+
+def percentile(samples, share):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(share * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def measure(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = client.get(url)
+        elapsed = time.perf_counter() - started
+    if response.status_code != 200:
+        raise RuntimeError('%s ответил %s' % (url, response.status_code))
+    return elapsed, len(queries), len(response.content)
+
+
+def latency(times):
+    return {
+        'mean_ms': round(statistics.mean(times) * 1000, 2),
+        'p50_ms': round(percentile(times, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(times, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(times, 0.99) * 1000, 2),
+    }
+
+
+def summarize(samples):
+    times = [elapsed for elapsed, _, _ in samples]
+    queries = [count for _, count, _ in samples]
+    sizes = [size for _, _, size in samples]
+    return {
+        'requests': len(samples),
+        'rps': round(len(times) / sum(times), 1),
+        **latency(times),
+        'queries_mean': round(statistics.mean(queries), 2),
+        'queries_max': max(queries),
+        'bytes_mean': round(statistics.mean(sizes)),
+    }
+
+
+def view_urls(rand):
+    """Генераторы адресов для каждого представления."""
+    pages = max(1, Post.objects.count() // settings.SHOWED_POSTS)
+    slugs = list(Group.objects.values_list('slug', flat=True))
+    usernames = list(User.objects.filter(
+        posts__isnull=False
+    ).distinct().values_list('username', flat=True))
+    post_ids = list(Post.objects.values_list('pk', flat=True)[:10000])
+    return {
+        'index': lambda: '%s?page=%s' % (
+            reverse('posts:index'), rand.randint(1, min(pages, 20))
+        ),
+        'group_posts': lambda: reverse(
+            'posts:group_list', args=[rand.choice(slugs)]
+        ),
+        'profile': lambda: reverse(
+            'posts:profile', args=[rand.choice(usernames)]
+        ),
+        'post_detail': lambda: reverse(
+            'posts:post_detail', args=[rand.choice(post_ids)]
+        ),
+        'follow_index': lambda: reverse('posts:follow_index'),
+    }
+
+
+def make_client(host=None, user=None):
+    # адрес не из INTERNAL_IPS, чтобы при DEBUG не мерить debug_toolbar
+    client = Client(
+        HTTP_HOST=host or settings.ALLOWED_HOSTS[0], REMOTE_ADDR='192.0.2.1'
+    )
+    if user is not None:
+        client.force_login(user)
+    return client
+
+
+def run(requests=200, warmup=10, views=None, seed_value=0, host=None):
+    """Прогоняет представления и возвращает сводку по каждому."""
+    rand = random.Random(seed_value)
+    anonymous = make_client(host)
+    readers = [
+        make_client(host, user) for user in
+        User.objects.filter(following__isnull=False).distinct()[:20]
+    ]
+    urls = view_urls(rand)
+    results = {}
+    for name in urls if views is None else views:
+        if name == 'follow_index' and not readers:
+            continue
+        samples = []
+        for i in range(warmup + requests):
+            client = anonymous
+            if name == 'follow_index':
+                client = rand.choice(readers)
+            sample = measure(client, urls[name]())
+            if i >= warmup:
+                samples.append(sample)
+        results[name] = summarize(samples)
+    return results
+
+
+def run_writes(requests=200, writers=4, seed_value=0, host=None,
+               write_behind=False):
+    """Параллельная запись: writers потоков шлют комментарии в add_comment.
+
+    rps здесь — комментариев в секунду на все потоки вместе; errors —
+    сколько запросов не дошло до редиректа (например, «database is
+    locked» у SQLite без WAL). С write_behind комментарии идут через
+    очередь (posts.spool) во временном каталоге, а после прогона она
+    разбирается одним drain(): drain_rps — скорость применения.
+    """
+    if write_behind:
+        spool_dir = tempfile.mkdtemp()
+        try:
+            with override_settings(WRITE_BEHIND=True,
+                                   WRITE_BEHIND_DIR=spool_dir):
+                result = run_writes(requests, writers, seed_value, host)
+                started = time.perf_counter()
+                drained = spool.drain(wait=True)
+                elapsed = time.perf_counter() - started
+        finally:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+        result.update({
+            'drained': drained,
+            'drain_rps': round(drained / elapsed, 1) if drained else 0,
+        })
+        return result
+    post_ids = list(Post.objects.values_list('pk', flat=True)[:10000])
+    clients = [
+        make_client(host, user)
+        for user in User.objects.order_by('pk')[:writers]
+    ]
+    times, errors = [], []
+    lock = threading.Lock()
+
+    def write(client, count, rand):
+        try:
+            for _ in range(count):
+                url = reverse(
+                    'posts:add_comment', args=[rand.choice(post_ids)]
+                )
+                started = time.perf_counter()
+                try:
+                    response = client.post(url, {'text': 'Комментарий'})
+                    ok = response.status_code == 302
+                except Exception:
+                    ok = False
+                elapsed = time.perf_counter() - started
+                with lock:
+                    (times if ok else errors).append(elapsed)
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=write, args=(
+            client, requests // len(clients),
+            random.Random(seed_value + number),
+        ))
+        for number, client in enumerate(clients)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(times) + len(errors),
+        'writers': len(clients),
+        'errors': len(errors),
+        'rps': round(len(times) / elapsed, 1),
+        **(latency(times) if times else {}),
+    }
+
+
+def _connect(base_url, timeout):
+    parts = urlsplit(base_url)
+    connection_class = (
+        http.client.HTTPSConnection if parts.scheme == 'https'
+        else http.client.HTTPConnection
+    )
+    return connection_class(parts.hostname, parts.port, timeout=timeout)
+
+
+def load(base_url, paths, connections=50, timeout=30):
+    """Шлёт paths из connections соединений keep-alive одновременно.
+
+    rps — ответов 200 в секунду на все соединения вместе; errors —
+    ответы с другим кодом и оборванные соединения.
+    """
+    prefix = urlsplit(base_url).path.rstrip('/')
+    times, errors = [], []
+    lock = threading.Lock()
+
+    def worker(chunk):
+        client = _connect(base_url, timeout)
+        try:
+            for path in chunk:
+                started = time.perf_counter()
+                try:
+                    client.request('GET', prefix + path)
+                    response = client.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except (OSError, http.client.HTTPException):
+                    # следующий request() откроет соединение заново
+                    client.close()
+                    ok = False
+                elapsed = time.perf_counter() - started
+                with lock:
+                    (times if ok else errors).append(elapsed)
+        finally:
+            client.close()
+
+    threads = [
+        threading.Thread(target=worker, args=(paths[number::connections],))
+        for number in range(min(connections, len(paths)))
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(times) + len(errors),
+        'connections': len(threads),
+        'errors': len(errors),
+        'rps': round(len(times) / elapsed, 1),
+        **(latency(times) if times else {}),
+    }
+
+
+def run_http(base_url, requests=1000, connections=50, warmup=50, views=None,
+             seed_value=0):
+    """Нагружает запущенный сервер; адреса строятся по текущей базе.
+
+    Сервер должен смотреть в ту же базу. Запросы анонимные, поэтому
+    follow_index пропускается.
+    """
+    rand = random.Random(seed_value)
+    urls = view_urls(rand)
+    results = {}
+    for name in urls if views is None else views:
+        if name == 'follow_index':
+            continue
+        load(base_url, [urls[name]() for _ in range(warmup)], connections)
+        results[name] = load(
+            base_url, [urls[name]() for _ in range(requests)], connections
+        )
+    return results
+
+
+def dataset():
+    return {
+        'users': User.objects.count(),
+        'groups': Group.objects.count(),
+        'posts': Post.objects.count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+    }
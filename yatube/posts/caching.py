@@ -0,0 +1,144 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.views.decorators.cache import cache_page
+
+from core.pagecache import bump_page_version
+
+from .models import Post
+from .spool import pending_changed
+
+FEED_VERSION_KEY = 'posts:feed_version'
+FEED_CHANGED_KEY = 'posts:feed_changed'
+
+
+def get_feed_version():
+    """Текущая версия лент; входит в ключи кеша страниц и фрагментов.
+
+    Начальное значение берётся из времени, чтобы после очистки кеша
+    версия не совпала ни с одной из выданных раньше.
+    """
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        cache.add(FEED_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(FEED_VERSION_KEY, 1)
+    return version
+
+
+def get_feed_changed():
+    """Время последнего изменения лент (unix time)."""
+    changed = cache.get(FEED_CHANGED_KEY)
+    if changed is None:
+        changed = int(time.time())
+        cache.add(FEED_CHANGED_KEY, changed, None)
+    return changed
+
+
+def bump_feed_version():
+    """Делает устаревшими все закешированные ленты и страницы."""
+    try:
+        cache.incr(FEED_VERSION_KEY)
+    except ValueError:
+        cache.set(FEED_VERSION_KEY, int(time.time() * 1000), None)
+    cache.set(FEED_CHANGED_KEY, int(time.time()), None)
+    # миниатюры и раскладка лент пишут в посты через update(), без сигналов
+    bump_page_version()
+
+
+def feed_cache_context():
+    """Переменные для {% cache %} во фрагментах лент."""
+    return {
+        'feed_version': get_feed_version(),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
+
+
+def cache_feed_page(key_prefix, timeout=None):
+    """Аналог cache_page, ключ которого меняется вместе с версией лент.
+
+    Страница может жить в кеше часами: новый или изменённый пост
+    поднимает версию, и следующий запрос строит страницу заново.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            cached_view = cache_page(
+                timeout or settings.FEED_CACHE_TIMEOUT,
+                key_prefix='%s.%s' % (key_prefix, get_feed_version()),
+            )(view_func)
+            return cached_view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _etag(*parts):
+    return hashlib.md5(
+        ':'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+
+
+def _pending_changed(request):
+    # свои ещё не применённые записи (spool) меняют страницу для автора
+    return pending_changed(request.user)
+
+
+def _with_pending(request, last_modified):
+    changed = _pending_changed(request)
+    if changed is None or last_modified is None:
+        return last_modified
+    return max(last_modified, datetime.fromtimestamp(changed, tz=timezone.utc))
+
+
+def feed_etag(request, *args, **kwargs):
+    """ETag лент: версия лент и пользователь, без запросов к БД."""
+    return _etag(
+        'feed', get_feed_version(), request.user.pk,
+        _pending_changed(request),
+    )
+
+
+def feed_last_modified(request, *args, **kwargs):
+    return _with_pending(
+        request, datetime.fromtimestamp(get_feed_changed(), tz=timezone.utc)
+    )
+
+
+def _post_state(request, post_id):
+    """Дата правки поста, последний комментарий и счётчики одним запросом.
+
+    Результат запоминается в запросе: его читают и ETag, и Last-Modified.
+    """
+    if not hasattr(request, '_post_state'):
+        request._post_state = Post.objects.filter(pk=post_id).order_by(
+        ).annotate(
+            last_comment=Max('comments__created')
+        ).values(
+            'edited', 'comments_count', 'last_comment',
+            'author__stats__posts_count',
+        ).first()
+    return request._post_state
+
+
+def post_etag(request, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    return _etag(
+        'post', post_id, state['edited'].timestamp(), state['comments_count'],
+        state['author__stats__posts_count'], request.user.pk,
+        _pending_changed(request),
+    )
+
+
+def post_last_modified(request, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    return _with_pending(
+        request, max(filter(None, (state['edited'], state['last_comment'])))
+    )
@@ -0,0 +1,67 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def change_user_counter(user_id, field, delta):
+    """Атомарно сдвигает счётчик пользователя на delta."""
+    stats = UserStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        # не уходим ниже нуля, если строки создавались в обход сигналов
+        stats.filter(**{field + '__gte': -delta}).update(
+            **{field: F(field) + delta}
+        )
+        return
+    if stats.update(**{field: F(field) + delta}):
+        return
+    # строки ещё нет: создаём её, а при гонке повторяем обновление
+    try:
+        with transaction.atomic():
+            UserStats.objects.create(user_id=user_id, **{field: delta})
+    except IntegrityError:
+        stats.update(**{field: F(field) + delta})
+
+
+def change_post_comments(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def _count(queryset, field):
+    """Подзапрос COUNT(*) по связанной таблице для UPDATE ... SET."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        Value(0),
+    )
+
+
+def rebuild_counters():
+    """Пересчитывает все счётчики по данным таблиц."""
+    with transaction.atomic():
+        missing = User.objects.filter(stats__isnull=True).values_list(
+            'pk', flat=True
+        )
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=pk) for pk in missing.iterator()],
+            batch_size=1000,
+        )
+        UserStats.objects.update(
+            posts_count=_count(Post.objects.all(), 'author'),
+            followers_count=_count(Follow.objects.all(), 'author'),
+            following_count=_count(Follow.objects.all(), 'user'),
+        )
+        Post.objects.update(
+            comments_count=_count(Comment.objects.all(), 'post'),
+        )
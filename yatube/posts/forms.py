@@ -10,6 +10,16 @@ class PostForm(forms.ModelForm):
             'image': ('Картинка в посте'),
         }
 
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        # файлы, отброшенные ImageUploadHandler, до формы не доходят
+        self.upload_errors = upload_errors or {}
+        super().__init__(*args, **kwargs)
+
+    def clean_image(self):
+        if 'image' in self.upload_errors:
+            raise forms.ValidationError(self.upload_errors['image'])
+        return self.cleaned_data['image']
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from tasks.queue import enqueue, task
+
+from .caching import bump_feed_version
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+
+def thumbnail_name(post_id, image_name, size, image_format='jpeg'):
+    """Путь миниатюры в каталоге поста.
+
+    Имя исходника берётся целиком, с расширением: pic.png и pic.jpg
+    одного поста, как и одинаковые файлы разных постов, не затрут
+    миниатюры друг друга.
+    """
+    return 'posts/thumbs/%s/%s_%s.%s' % (
+        post_id, os.path.basename(image_name), size, image_format
+    )
+
+
+def supported_formats():
+    """Форматы вариантов из настроек, которые умеет сохранять Pillow."""
+    Image.init()
+    return [
+        image_format for image_format in settings.POST_IMAGE_VARIANT_FORMATS
+        if image_format.upper() in Image.SAVE
+    ]
+
+
+def variant_sizes():
+    """Размеры вариантов: ширины из настроек в пропорциях миниатюры."""
+    width, height = (
+        int(side) for side in settings.POST_THUMBNAIL_SIZES[0].split('x')
+    )
+    return [
+        (variant_width, round(height * variant_width / width))
+        for variant_width in settings.POST_IMAGE_VARIANT_WIDTHS
+    ]
+
+
+def make_thumbnail(image, size, image_format='jpeg'):
+    """Вписывает картинку в размер с обрезкой по центру, как sorl crop."""
+    if isinstance(size, str):
+        size = tuple(int(side) for side in size.split('x'))
+    thumb = ImageOps.fit(
+        ImageOps.exif_transpose(image).convert('RGB'), size, Image.LANCZOS,
+    )
+    buffer = BytesIO()
+    if image_format == 'jpeg':
+        thumb.save(buffer, 'JPEG', quality=85, optimize=True,
+                   progressive=True)
+    else:
+        thumb.save(buffer, image_format.upper(), quality=70)
+    return buffer.getvalue()
+
+
+def _save(storage, name, content):
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(content))
+
+
+def build_images(post_id, image_name, storage=default_storage):
+    """Строит миниатюры и адаптивные варианты картинки, не трогая БД.
+
+    Возвращает словарь для Post.thumbnails: размер миниатюры -> путь
+    и variants: формат -> {ширина: путь}. Сначала всё кодируется в
+    памяти и только потом пишется в хранилище, одним коротким заходом.
+    """
+    with storage.open(image_name) as source:
+        image = Image.open(source)
+        image.load()
+    encoded = {
+        size: (
+            thumbnail_name(post_id, image_name, size),
+            make_thumbnail(image, size),
+        )
+        for size in settings.POST_THUMBNAIL_SIZES
+    }
+    encoded_variants = {
+        image_format: {
+            width: (
+                thumbnail_name(
+                    post_id, image_name, '%sx%s' % (width, height),
+                    image_format,
+                ),
+                make_thumbnail(image, (width, height), image_format),
+            )
+            for width, height in variant_sizes()
+        }
+        for image_format in supported_formats()
+    }
+    names = {'source': image_name, 'variants': {}}
+    for size, (name, content) in encoded.items():
+        names[size] = _save(storage, name, content)
+    for image_format, variants in encoded_variants.items():
+        names['variants'][image_format] = {
+            width: _save(storage, name, content)
+            for width, (name, content) in variants.items()
+        }
+    return names
+
+
+def save_images(post_id, image_name, names):
+    """Записывает пути в пост, если картинку не успели заменить."""
+    return Post.objects.filter(pk=post_id, image=image_name).update(
+        thumbnails=json.dumps(names), edited=timezone.now()
+    )
+
+
+@task
+def generate_images(post_id, image_name):
+    """Строит картинки поста и записывает пути в пост (фоновая задача)."""
+    if save_images(post_id, image_name, build_images(post_id, image_name)):
+        bump_feed_version()
+
+
+def schedule_thumbnails(post):
+    """Ставит построение миниатюр в очередь задач.
+
+    Пока задача ждёт, шаблоны показывают исходную картинку. Если
+    картинку успеют заменить ещё раз, ожидающая задача возьмёт новую.
+    """
+    enqueue(
+        generate_images, post.pk, post.image.name,
+        dedup_key='post_images:%s' % post.pk,
+    )
+
+
+def _init_process():
+    # при spawn процесс стартует с нуля, при fork — наследует
+    # соединения родителя, которыми пользоваться нельзя
+    django.setup()
+    connections.close_all()
+
+
+def _build_in_process(post_id, image_name):
+    try:
+        return post_id, image_name, build_images(post_id, image_name)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры поста %s', post_id)
+        return post_id, image_name, None
+
+
+def backfill_images(workers=None, missing_only=False, chunk_size=100):
+    """Строит картинки для уже существующих постов в пуле процессов.
+
+    Картинки декодируются и кодируются в дочерних процессах, а в БД
+    пишет только текущий. Возвращает число обновлённых постов.
+    """
+    posts = Post.objects.exclude(image='').order_by('pk')
+    if missing_only:
+        posts = posts.filter(thumbnails='')
+    jobs = list(posts.values_list('pk', 'image'))
+    if not jobs:
+        return 0
+    updated = 0
+    # дочерним процессам нельзя делить сокет БД с родителем
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_process,
+    ) as pool:
+        results = pool.map(
+            _build_in_process, *zip(*jobs), chunksize=chunk_size,
+        )
+        for post_id, image_name, names in results:
+            if names is not None:
+                updated += save_images(post_id, image_name, names)
+    if updated:
+        bump_feed_version()
+    return updated
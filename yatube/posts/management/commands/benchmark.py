@@ -0,0 +1,177 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_databases, teardown_databases
+from django.utils import timezone
+
+from posts import benchmark
+
+READ_VIEWS = (
+    'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+)
+VIEWS = READ_VIEWS + ('add_comment',)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон лент и страницы поста: задержки, число '
+        'SQL-запросов и размер ответа. По умолчанию данные создаются '
+        'во временной тестовой базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=40000)
+        parser.add_argument('--follows', type=int, default=2000)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Замеров на представление.')
+        parser.add_argument('--warmup', type=int, default=10,
+                            help='Запросов до начала замеров.')
+        parser.add_argument('--views', nargs='+', choices=VIEWS)
+        parser.add_argument('--writers', type=int, default=4,
+                            help='Потоков, пишущих комментарии.')
+        parser.add_argument('--write-requests', type=int, default=200)
+        parser.add_argument(
+            '--write-behind', action='store_true',
+            help='Ещё раз прогнать add_comment через очередь WRITE_BEHIND.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--current-db', action='store_true',
+                            help='Мерить на текущей базе, без наполнения.')
+        parser.add_argument(
+            '--url',
+            help='Нагружать по HTTP запущенный сервер (например, '
+                 'gunicorn или uvicorn на http://127.0.0.1:8000); адреса '
+                 'берутся из текущей базы, как при --current-db.',
+        )
+        parser.add_argument('--connections', type=int, default=50,
+                            help='Одновременных соединений при --url.')
+        parser.add_argument('--output', help='Куда записать JSON.')
+
+    def handle(self, *args, **options):
+        if options['current_db'] or options['url']:
+            report = self.measure(options)
+        else:
+            if connection.vendor == 'sqlite':
+                # тестовая SQLite в памяти не годится для записи из
+                # нескольких потоков: берём временный файл
+                self.temp_dir = tempfile.mkdtemp()
+                connection.settings_dict['TEST']['NAME'] = os.path.join(
+                    self.temp_dir, 'benchmark.sqlite3'
+                )
+            old_config = setup_databases(verbosity=0, interactive=False)
+            try:
+                self.stdout.write('Наполнение базы...')
+                benchmark.seed(
+                    users=options['users'], groups=options['groups'],
+                    posts=options['posts'], comments=options['comments'],
+                    follows=options['follows'], seed_value=options['seed'],
+                )
+                report = self.measure(options)
+            finally:
+                teardown_databases(old_config, verbosity=0)
+                if connection.vendor == 'sqlite':
+                    shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+        for name, result in report['views'].items():
+            self.stdout.write(self.format_result(name, result))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                'Результат записан в %s.' % options['output']
+            ))
+
+    def format_result(self, name, result):
+        line = (
+            '{name:<13} p50 {p50_ms:>8} мс  p95 {p95_ms:>8} мс  '
+            'p99 {p99_ms:>8} мс  {rps:>7} rps  '
+        ).format(name=name, **result)
+        if 'drain_rps' in result:
+            return line + (
+                'потоков {writers}  ошибок {errors}  '
+                'применение {drain_rps} rps'
+            ).format(**result)
+        if 'writers' in result:
+            return line + 'потоков {writers}  ошибок {errors}'.format(
+                **result
+            )
+        if 'connections' in result:
+            return line + 'соединений {connections}  ошибок {errors}'.format(
+                **result
+            )
+        return line + (
+            'запросов {queries_mean:>5}  байт {bytes_mean:>7}'
+        ).format(**result)
+
+    def measure(self, options):
+        views = options['views'] or VIEWS
+        if options['url']:
+            return self.measure_http(options, views)
+        report = {
+            'created': timezone.now().isoformat(),
+            'environment': {
+                'database': connection.vendor,
+                'cache': settings.CACHE_BACKEND,
+                'debug': settings.DEBUG,
+                'cursor_pagination': settings.POSTS_CURSOR_PAGINATION,
+                'follow_timeline': settings.FOLLOW_TIMELINE,
+                'sqlite_pragmas': (
+                    settings.SQLITE_PRAGMAS
+                    if connection.vendor == 'sqlite' else None
+                ),
+            },
+            'options': {
+                key: options[key]
+                for key in ('requests', 'warmup', 'views', 'seed')
+            },
+            'dataset': benchmark.dataset(),
+            'views': benchmark.run(
+                requests=options['requests'], warmup=options['warmup'],
+                views=[name for name in views if name in READ_VIEWS],
+                seed_value=options['seed'],
+            ),
+        }
+        if 'add_comment' in views:
+            report['views']['add_comment'] = benchmark.run_writes(
+                requests=options['write_requests'],
+                writers=options['writers'], seed_value=options['seed'],
+            )
+            if options['write_behind']:
+                report['views']['add_comment_write_behind'] = (
+                    benchmark.run_writes(
+                        requests=options['write_requests'],
+                        writers=options['writers'],
+                        seed_value=options['seed'], write_behind=True,
+                    )
+                )
+        return report
+
+    def measure_http(self, options, views):
+        return {
+            'created': timezone.now().isoformat(),
+            'environment': {
+                'url': options['url'],
+                'database': connection.vendor,
+            },
+            'options': {
+                key: options[key]
+                for key in ('requests', 'warmup', 'views', 'seed',
+                            'connections')
+            },
+            'dataset': benchmark.dataset(),
+            'views': benchmark.run_http(
+                options['url'], requests=options['requests'],
+                connections=options['connections'],
+                warmup=options['warmup'],
+                views=[name for name in views if name in READ_VIEWS],
+                seed_value=options['seed'],
+            ),
+        }
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts.images import backfill_images
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры и адаптивные варианты картинок постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Число процессов; по умолчанию — по числу ядер.',
+        )
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='Только посты, для которых картинки ещё не построены.',
+        )
+
+    def handle(self, *args, **options):
+        updated = backfill_images(
+            workers=options['workers'], missing_only=options['missing'],
+        )
+        self.stdout.write(
+            self.style.SUCCESS('Обновлено постов: %s.' % updated)
+        )
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import spool
+
+
+class Command(BaseCommand):
+    help = (
+        'Применяет отложенные комментарии и подписки (WRITE_BEHIND) '
+        'пачками. Без --once работает, пока его не остановят.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Разобрать очередь один раз и выйти.')
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.WRITE_BEHIND_BATCH_SIZE)
+        parser.add_argument('--interval', type=float,
+                            default=settings.WRITE_BEHIND_INTERVAL,
+                            help='Пауза, когда очередь пуста (секунды).')
+
+    def handle(self, *args, **options):
+        while True:
+            applied = spool.drain(batch_size=options['batch_size'])
+            if applied:
+                self.stdout.write('Применено записей: %s' % applied)
+            if options['once']:
+                return
+            if not applied:
+                time.sleep(options['interval'])
@@ -0,0 +1,29 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Выгружает группы, посты, комментарии или подписки в JSONL/CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=transfer.KINDS)
+        parser.add_argument('path', help='Файл или «-» для stdout.')
+        parser.add_argument('--format', choices=transfer.FORMATS)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or transfer.guess_format(path)
+        fields = transfer.KINDS[options['kind']][1]
+        rows = transfer.export_rows(options['kind'], options['chunk_size'])
+        if path == '-':
+            transfer.write_rows(sys.stdout, file_format, fields, rows)
+            return
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            written = transfer.write_rows(file, file_format, fields, rows)
+        self.stdout.write(self.style.SUCCESS(
+            'Выгружено строк: %s.' % written
+        ))
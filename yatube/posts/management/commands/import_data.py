@@ -0,0 +1,43 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает группы, посты, комментарии или подписки из JSONL/CSV '
+        'пачками bulk_create и пересчитывает счётчики, индекс и ленты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=transfer.KINDS)
+        parser.add_argument('path', help='Файл или «-» для stdin.')
+        parser.add_argument('--format', choices=transfer.FORMATS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--ignore-conflicts', action='store_true',
+            help='Пропускать строки с уже занятыми id.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or transfer.guess_format(path)
+        if path == '-':
+            imported = self.load(sys.stdin, file_format, options)
+        else:
+            with open(path, encoding='utf-8', newline='') as file:
+                imported = self.load(file, file_format, options)
+        transfer.reset_sequences([transfer.KINDS[options['kind']][0]])
+        transfer.rebuild_derived()
+        self.stdout.write(self.style.SUCCESS(
+            'Загружено строк: %s.' % imported
+        ))
+
+    def load(self, file, file_format, options):
+        return transfer.import_rows(
+            options['kind'], transfer.read_rows(file, file_format),
+            batch_size=options['batch_size'],
+            ignore_conflicts=options['ignore_conflicts'],
+        )
@@ -0,0 +1,86 @@
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import migrations
+
+# Документы в FTS5 хранятся уже приведёнными к основе, как их пишет и
+# ищет posts.search. Стеммер — чистая функция без моделей и настроек;
+# если он изменится, индекс всё равно пересобирают rebuild_search_index.
+from posts.stemmer import stems
+
+INDEX_TABLE = 'posts_search_index'
+
+
+def sqlite_documents(apps):
+    """Пары (id поста, текст поста и его комментариев), по порядку id."""
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    comments = groupby(
+        Comment.objects.order_by('post_id', 'pk').values_list(
+            'post_id', 'text'
+        ).iterator(),
+        key=itemgetter(0),
+    )
+    post_comments = next(comments, (None, ()))
+    for post_id, text in Post.objects.order_by('pk').values_list(
+        'pk', 'text'
+    ).iterator():
+        while post_comments[0] is not None and post_comments[0] < post_id:
+            post_comments = next(comments, (None, ()))
+        texts = []
+        if post_comments[0] == post_id:
+            texts = [comment for _, comment in post_comments[1]]
+        yield post_id, '\n'.join([text, *texts])
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5(body, '
+                "tokenize = 'unicode61 remove_diacritics 2')" % INDEX_TABLE
+            )
+            for post_id, text in sqlite_documents(apps):
+                cursor.execute(
+                    'INSERT INTO %s (rowid, body) VALUES (%%s, %%s)'
+                    % INDEX_TABLE,
+                    [post_id, ' '.join(stems(text))],
+                )
+        elif vendor == 'postgresql':
+            cursor.execute(
+                'CREATE TABLE IF NOT EXISTS {table} ('
+                'post_id integer PRIMARY KEY REFERENCES posts_post (id) '
+                'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+                'document tsvector NOT NULL); '
+                'CREATE INDEX IF NOT EXISTS {table}_document_idx '
+                'ON {table} USING gin (document)'.format(table=INDEX_TABLE)
+            )
+            cursor.execute(
+                'INSERT INTO {table} (post_id, document) '
+                'SELECT p.id, to_tsvector(%s::regconfig, concat_ws('
+                'chr(10), p.text, string_agg(c.text, chr(10) '
+                'ORDER BY c.id))) '
+                'FROM posts_post p '
+                'LEFT JOIN posts_comment c ON c.post_id = p.id '
+                'GROUP BY p.id'.format(table=INDEX_TABLE),
+                [getattr(settings, 'SEARCH_POSTGRES_CONFIG', 'russian')],
+            )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS %s' % INDEX_TABLE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_thumbnails'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
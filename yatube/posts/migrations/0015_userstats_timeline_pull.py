@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 07:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_celebrities(apps, schema_editor):
+    # их посты уже не раскладывались по лентам
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gt=settings.FOLLOW_TIMELINE_FANOUT_LIMIT
+    ).update(timeline_pull=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_comment_cursor_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='timeline_pull',
+            field=models.BooleanField(default=False, help_text='Ставится, когда подписчиков больше FOLLOW_TIMELINE_FANOUT_LIMIT', verbose_name='Посты подмешиваются в ленты при чтении'),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
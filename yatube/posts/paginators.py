@@ -0,0 +1,191 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .caching import get_feed_version
+
+
+def page_window(page, around=None):
+    """Номера для навигации вместо полного page_range.
+
+    Первая, последняя и around (PAGINATOR_WINDOW) страниц по обе стороны
+    от текущей; None — пропуск («…»).
+    """
+    if around is None:
+        around = settings.PAGINATOR_WINDOW
+    last = page.paginator.num_pages
+    numbers = {1, last} | set(range(
+        max(1, page.number - around), min(last, page.number + around) + 1
+    ))
+    window = []
+    for number in sorted(numbers):
+        if window and number - window[-1] == 2:
+            # одну страницу показываем, а не прячем за «…»
+            window.append(number - 1)
+        elif window and number - window[-1] > 2:
+            window.append(None)
+        window.append(number)
+    return window
+
+
+class CountedPaginator(Paginator):
+    """Paginator без COUNT(*) на каждый запрос.
+
+    Число записей берётся готовым (count — например, из счётчиков
+    UserStats) или из кеша по count_key. Ключ кеша включает версию лент,
+    а она меняется при любом изменении постов и подписок, так что число
+    остаётся точным и считается заново один раз на версию.
+    """
+
+    def __init__(self, object_list, per_page, count=None, count_key=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.known_count = count
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        if self.count_key is None:
+            return super().count
+        key = 'posts:count:%s:%s' % (get_feed_version(), self.count_key)
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, settings.FEED_CACHE_TIMEOUT)
+        return count
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации: без номера и общего числа страниц."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page of %s objects>' % len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1])
+
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.encode_cursor(self.object_list[0])
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по упорядоченным полям (по умолчанию pub_date, id).
+
+    Страница выбирается условием WHERE по ключу последней показанной записи,
+    поэтому не нужны ни COUNT(*), ни OFFSET: любая страница стоит как первая.
+    Курсоры непрозрачны для клиента: это base64 от значений ключа.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        super().__init__(object_list, per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = [name.startswith('-') for name in self.ordering]
+
+    def encode_cursor(self, obj):
+        """Курсор записи: модели или словаря из .values()."""
+        values = []
+        for field in self.fields:
+            if isinstance(obj, dict):
+                value = obj[field]
+            else:
+                value = getattr(obj, field)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(str(value))
+        raw = '|'.join(values).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает значения ключа или None, если курсор испорчен."""
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        except (binascii.Error, UnicodeError, ValueError):
+            return None
+        parts = raw.split('|')
+        if len(parts) != len(self.fields):
+            return None
+        values = []
+        for field, part in zip(self.fields, parts):
+            model_field = self.object_list.model._meta.get_field(field)
+            try:
+                if model_field.get_internal_type() == 'DateTimeField':
+                    # parse_datetime падает на несуществующей дате
+                    value = parse_datetime(part)
+                else:
+                    value = model_field.to_python(part)
+            except Exception:
+                value = None
+            if value is None:
+                return None
+            values.append(value)
+        return values
+
+    def _seek(self, values, forward):
+        """Условие «строго после ключа» в направлении обхода."""
+        condition = Q()
+        for index in range(len(self.fields) - 1, -1, -1):
+            field = self.fields[index]
+            # при обратном обходе направление сравнения меняется
+            newer = self.descending[index] == forward
+            lookup = '%s__%s' % (field, 'lt' if newer else 'gt')
+            step = Q(**{lookup: values[index]})
+            if index < len(self.fields) - 1:
+                step |= Q(**{field: values[index]}) & condition
+            condition = step
+        return condition
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else '-' + name
+            for name in self.ordering
+        ]
+
+    def page_for(self, after=None, before=None):
+        """Страница после курсора `after` или перед курсором `before`."""
+        after_values = self.decode_cursor(after)
+        before_values = self.decode_cursor(before)
+        queryset = self.object_list
+        if before_values is not None:
+            rows = list(
+                queryset.filter(self._seek(before_values, forward=False))
+                .order_by(*self._reversed_ordering())[:self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return CursorPage(rows, self, bool(rows), has_previous)
+        if after_values is not None:
+            queryset = queryset.filter(self._seek(after_values, forward=True))
+        rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return CursorPage(
+            rows[:self.per_page], self, has_next, after_values is not None
+        )
@@ -0,0 +1,206 @@
+"""Полнотекстовый поиск по постам и комментариям к ним.
+
+Для каждого поста хранится документ из его текста и текстов
+комментариев. Хранилище зависит от СУБД:
+
+* SQLite — виртуальная таблица FTS5; слова приводятся к основе
+  русским стеммером (posts.stemmer) до записи и при поиске;
+* PostgreSQL — столбец tsvector с GIN-индексом и словарём
+  SEARCH_POSTGRES_CONFIG (по умолчанию russian);
+* остальные — поиск подстроки без индекса.
+
+Документы обновляет фоновая задача index_post, которую ставят сигналы
+при сохранении и удалении постов и комментариев; после массовой
+загрузки — командой rebuild_search_index.
+"""
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from tasks.queue import task
+
+from .models import Comment, Post
+from .stemmer import stems
+
+INDEX_TABLE = 'posts_search_index'
+
+
+class SqliteIndex:
+    def create(self, cursor):
+        cursor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5('
+            "body, tokenize = 'unicode61 remove_diacritics 2')" % INDEX_TABLE
+        )
+
+    def drop(self, cursor):
+        cursor.execute('DROP TABLE IF EXISTS %s' % INDEX_TABLE)
+
+    def clear(self, cursor):
+        cursor.execute('DELETE FROM %s' % INDEX_TABLE)
+
+    def store(self, cursor, post_id, text):
+        self.remove(cursor, post_id)
+        cursor.execute(
+            'INSERT INTO %s (rowid, body) VALUES (%%s, %%s)' % INDEX_TABLE,
+            [post_id, ' '.join(stems(text))],
+        )
+
+    def remove(self, cursor, post_id):
+        cursor.execute(
+            'DELETE FROM %s WHERE rowid = %%s' % INDEX_TABLE, [post_id]
+        )
+
+    def filter(self, queryset, query):
+        terms = stems(query)
+        if not terms:
+            return queryset.none()
+        # каждое слово в кавычках: все должны встретиться в документе
+        match = ' '.join('"%s"' % term for term in terms)
+        return queryset.filter(pk__in=RawSQL(
+            'SELECT rowid FROM %s WHERE %s MATCH %%s'
+            % (INDEX_TABLE, INDEX_TABLE),
+            [match],
+        ))
+
+
+class PostgresIndex:
+    def create(self, cursor):
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS {table} ('
+            'post_id integer PRIMARY KEY REFERENCES posts_post (id) '
+            'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            'document tsvector NOT NULL); '
+            'CREATE INDEX IF NOT EXISTS {table}_document_idx '
+            'ON {table} USING gin (document)'.format(table=INDEX_TABLE)
+        )
+
+    def drop(self, cursor):
+        cursor.execute('DROP TABLE IF EXISTS %s' % INDEX_TABLE)
+
+    def clear(self, cursor):
+        cursor.execute('DELETE FROM %s' % INDEX_TABLE)
+
+    def store(self, cursor, post_id, text):
+        cursor.execute(
+            'INSERT INTO %s (post_id, document) '
+            'VALUES (%%s, to_tsvector(%%s::regconfig, %%s)) '
+            'ON CONFLICT (post_id) DO UPDATE '
+            'SET document = EXCLUDED.document' % INDEX_TABLE,
+            [post_id, settings.SEARCH_POSTGRES_CONFIG, text],
+        )
+
+    def remove(self, cursor, post_id):
+        cursor.execute(
+            'DELETE FROM %s WHERE post_id = %%s' % INDEX_TABLE, [post_id]
+        )
+
+    def filter(self, queryset, query):
+        return queryset.filter(pk__in=RawSQL(
+            'SELECT post_id FROM %s WHERE document @@ '
+            'plainto_tsquery(%%s::regconfig, %%s)' % INDEX_TABLE,
+            [settings.SEARCH_POSTGRES_CONFIG, query],
+        ))
+
+
+class SubstringIndex:
+    """Запасной вариант без индекса: поиск подстроки."""
+
+    def create(self, cursor):
+        pass
+
+    drop = clear = create
+
+    def store(self, cursor, post_id, text):
+        pass
+
+    def remove(self, cursor, post_id):
+        pass
+
+    def filter(self, queryset, query):
+        words = query.split()
+        if not words:
+            return queryset.none()
+        for word in words:
+            queryset = queryset.filter(pk__in=Post.objects.filter(
+                Q(text__icontains=word) | Q(comments__text__icontains=word)
+            ).values('pk'))
+        return queryset
+
+
+BACKENDS = {
+    'sqlite': SqliteIndex,
+    'postgresql': PostgresIndex,
+}
+
+
+def get_index(using=None):
+    return BACKENDS.get((using or connection).vendor, SubstringIndex)()
+
+
+def document(text, comments):
+    """Текст документа поста: сам пост и все комментарии к нему."""
+    return '\n'.join([text, *comments])
+
+
+@task
+def index_post(post_id):
+    """Пересобирает документ поста; удалённый пост убирает из индекса."""
+    text = Post.objects.filter(pk=post_id).values_list(
+        'text', flat=True
+    ).first()
+    with connection.cursor() as cursor:
+        if text is None:
+            get_index().remove(cursor, post_id)
+            return
+        comments = Comment.objects.filter(post_id=post_id).order_by(
+            'pk'
+        ).values_list('text', flat=True)
+        get_index().store(cursor, post_id, document(text, comments))
+
+
+def rebuild():
+    """Пересобирает индекс по всем постам."""
+    index = get_index()
+    with connection.cursor() as cursor:
+        index.create(cursor)
+        index.clear(cursor)
+        fill(cursor, index, Post, Comment)
+
+
+def fill(cursor, index, post_model, comment_model):
+    """Заполняет индекс постами и комментариями моделей post_model и
+    comment_model.
+
+    Посты и комментарии читаются двумя потоками в порядке id поста,
+    поэтому в памяти держатся комментарии только одного поста.
+    """
+    comments = groupby(
+        comment_model.objects.order_by('post_id', 'pk').values_list(
+            'post_id', 'text'
+        ).iterator(),
+        key=itemgetter(0),
+    )
+    post_comments = next(comments, (None, ()))
+    for post_id, text in post_model.objects.order_by('pk').values_list(
+        'pk', 'text'
+    ).iterator():
+        while post_comments[0] is not None and post_comments[0] < post_id:
+            post_comments = next(comments, (None, ()))
+        texts = ()
+        if post_comments[0] == post_id:
+            texts = [comment for _, comment in post_comments[1]]
+        index.store(cursor, post_id, document(text, texts))
+
+
+def search(query, queryset=None):
+    """Посты, в которых (или в комментариях к которым) есть все слова."""
+    if queryset is None:
+        queryset = Post.objects.all()
+    query = query.strip()
+    if not query:
+        return queryset.none()
+    return get_index().filter(queryset, query)
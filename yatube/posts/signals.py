@@ -0,0 +1,129 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from tasks.queue import enqueue
+
+from . import search, timeline
+from .caching import bump_feed_version
+from .counters import change_post_comments, change_user_counter
+from .images import schedule_thumbnails
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_user_counter(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    change_user_counter(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_post_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    change_post_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_user_counter(instance.author_id, 'followers_count', 1)
+        change_user_counter(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_user_counter(instance.author_id, 'followers_count', -1)
+    change_user_counter(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and timeline.is_enabled():
+        enqueue(timeline.fan_out_post, instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and timeline.is_enabled():
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_trim(sender, instance, **kwargs):
+    if timeline.is_enabled():
+        timeline.trim(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def feed_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_feed_version()
+
+
+def touch_posts(posts):
+    # отметка правки входит в ключ карточки поста и ETag его страницы;
+    # версия лент — в ETag групп и профилей, шапки которых изменились
+    posts.update(edited=timezone.now())
+    bump_feed_version()
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, raw=False, update_fields=None,
+                   **kwargs):
+    # вход пишет только last_login, на страницах его нет
+    if created or raw or (update_fields and set(update_fields) <= {
+        'last_login'
+    }):
+        return
+    touch_posts(Post.objects.filter(author=instance))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, raw=False, created=False, **kwargs):
+    if not created and not raw:
+        touch_posts(Post.objects.filter(group=instance))
+
+
+@receiver(post_save, sender=Post)
+def post_image_saved(sender, instance, raw=False, **kwargs):
+    if not raw and instance.image and not instance.thumbnail_names:
+        schedule_thumbnails(instance)
+
+
+def schedule_index(post_id):
+    # сотня комментариев подряд переиндексирует пост один раз
+    enqueue(search.index_post, post_id, dedup_key='search:%s' % post_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_search_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_index(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_search_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_index(instance.post_id)
@@ -0,0 +1,111 @@
+"""Стеммер для русского языка по алгоритму Snowball (Портера).
+
+Отрезает окончания и суффиксы, чтобы «котики», «котиков» и «котик»
+попадали в поиск как одно слово. Латиница и цифры не меняются.
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (('в', 'вши', 'вшись'),
+                     ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'))
+REFLEXIVE = ((), ('ся', 'сь'))
+ADJECTIVE = ((), ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый',
+                  'ой', 'ем', 'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому',
+                  'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею'))
+PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+VERB = (('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+         'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+        ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+         'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+         'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'))
+NOUN = ((), ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи',
+             'ии', 'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием',
+             'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию',
+             'ью', 'ю', 'ия', 'ья', 'я'))
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+WORD_RE = re.compile(r'\w+')
+
+
+def _cut(rv, endings):
+    """Отрезает самое длинное окончание группы; None, если его нет.
+
+    Окончания из первой подгруппы отрезаются, только если перед ними
+    стоит «а» или «я» (сама буква остаётся).
+    """
+    after_a, plain = endings
+    for ending in sorted(after_a + plain, key=len, reverse=True):
+        if rv.endswith(ending):
+            rest = rv[:-len(ending)]
+            if ending in plain or rest.endswith(('а', 'я')):
+                return rest
+            return None
+    return None
+
+
+def _region(word, start):
+    """Начало области после первой согласной, следующей за гласной."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _strip_ending(rv):
+    """Шаг 1: деепричастие либо возвратность и одно из окончаний."""
+    cut = _cut(rv, PERFECTIVE_GERUND)
+    if cut is not None:
+        return cut
+    cut = _cut(rv, REFLEXIVE)
+    if cut is not None:
+        rv = cut
+    cut = _cut(rv, ADJECTIVE)
+    if cut is not None:
+        participle = _cut(cut, PARTICIPLE)
+        return cut if participle is None else participle
+    for endings in (VERB, NOUN):
+        cut = _cut(rv, endings)
+        if cut is not None:
+            return cut
+    return rv
+
+
+def _tidy_up(rv):
+    """Шаг 4: двойное «н», превосходная степень, мягкий знак."""
+    if rv.endswith('нн'):
+        return rv[:-1]
+    for ending in SUPERLATIVE:
+        if rv.endswith(ending):
+            rv = rv[:-len(ending)]
+            return rv[:-1] if rv.endswith('нн') else rv
+    if rv.endswith('ь'):
+        return rv[:-1]
+    return rv
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv_start = next(
+        (i + 1 for i, letter in enumerate(word) if letter in VOWELS), None
+    )
+    if rv_start is None:
+        return word
+    r2_start = _region(word, _region(word, 0))
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    rv = _strip_ending(rv)
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    for ending in DERIVATIONAL:
+        if (rv.endswith(ending)
+                and rv_start + len(rv) - len(ending) >= r2_start):
+            rv = rv[:-len(ending)]
+            break
+    return prefix + _tidy_up(rv)
+
+
+def stems(text):
+    """Основы всех слов текста в порядке появления."""
+    return [stem(word) for word in WORD_RE.findall(text)]
@@ -0,0 +1,11 @@
+from django import template
+
+from posts.paginators import page_window as get_page_window
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page):
+    """Номера страниц для paginator.html; None — пропуск."""
+    return get_page_window(page)
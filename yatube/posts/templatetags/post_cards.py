@@ -0,0 +1,36 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/posts.html'
+
+
+def card_cache_key(post):
+    """Ключ карточки меняется при любом сохранении поста, а также его
+    автора и группы: их сигналы обновляют Post.edited."""
+    return 'post_card:%s:%s' % (post.pk, post.edited.timestamp())
+
+
+@register.simple_tag
+def post_cards(posts):
+    """HTML карточек постов страницы; готовые берутся из кеша одним запросом.
+
+    Карточки общие для всех лент, поэтому пост, показанный на главной,
+    не перерисовывается на странице группы, профиля или подписок.
+    """
+    posts = list(posts)
+    keys = [card_cache_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {}
+    for key, post in zip(keys, posts):
+        if key not in cards:
+            cards[key] = missing[key] = render_to_string(
+                CARD_TEMPLATE, {'post': post}
+            )
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,43 @@
+from django import template
+from django.conf import settings
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail_url(post, size):
+    """URL готовой миниатюры; пока её нет — URL исходной картинки."""
+    if not post.image:
+        return ''
+    name = post.thumbnail_names.get(size)
+    if name is None:
+        return post.image.url
+    return post.image.storage.url(name)
+
+
+@register.filter
+def image_sources(post):
+    """Пары (MIME-тип, srcset) для <source> внутри <picture>.
+
+    Порядок форматов — как в POST_IMAGE_VARIANT_FORMATS: браузер берёт
+    первый поддерживаемый.
+    """
+    if not post.image:
+        return []
+    storage = post.image.storage
+    sources = []
+    variants = post.thumbnail_names.get('variants', {})
+    for image_format, names in variants.items():
+        srcset = ', '.join(
+            '%s %sw' % (storage.url(name), width)
+            for width, name in sorted(
+                names.items(), key=lambda item: int(item[0])
+            )
+        )
+        sources.append(('image/%s' % image_format, srcset))
+    return sources
+
+
+@register.simple_tag
+def image_sizes():
+    return settings.POST_IMAGE_SIZES
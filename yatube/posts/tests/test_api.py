@@ -0,0 +1,115 @@
+import base64
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text='Пост %s' % i,
+                group=cls.group if i % 2 else None,
+            )
+            for i in range(15)
+        ]
+        for i in range(3):
+            Comment.objects.create(
+                post=cls.posts[0], author=cls.reader, text='Комментарий %s' % i
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get(self, name, *args, **params):
+        response = self.client.get(reverse('api:%s' % name, args=args), params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response, response.json()
+
+    def test_index_cursor_pages(self):
+        """Лента отдаётся курсорными страницами без повторов."""
+        with self.assertNumQueries(1):
+            _, data = self.get('index')
+        self.assertEqual(len(data['results']), 10)
+        self.assertIsNone(data['previous'])
+        _, second = self.get('index', after=data['next'])
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next'])
+        ids = [post['id'] for post in data['results'] + second['results']]
+        self.assertEqual(ids, [post.pk for post in reversed(self.posts)])
+        self.assertEqual(set(data['results'][0]), {
+            'id', 'text', 'pub_date', 'author', 'group', 'image',
+            'comments_count',
+        })
+
+    def test_bad_cursor_returns_first_page(self):
+        """Испорченный курсор, даже с верным base64, — первая страница."""
+        _, first = self.get('index')
+        bad_date = base64.urlsafe_b64encode(
+            b'2020-99-99T00:00:00|1'
+        ).decode().rstrip('=')
+        for cursor in ('%%%', bad_date):
+            for name in ('after', 'before'):
+                with self.subTest(cursor=cursor, name=name):
+                    response, data = self.get('index', **{name: cursor})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(data, first)
+        response, data = self.get(
+            'post_comments', self.posts[0].pk, after=bad_date
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(data['results']), 3)
+
+    def test_limit(self):
+        _, data = self.get('index', limit=3)
+        self.assertEqual(len(data['results']), 3)
+        _, data = self.get('index', limit=1000)
+        self.assertEqual(len(data['results']), 15)
+
+    def test_group_and_profile(self):
+        _, data = self.get('group_posts', 'group')
+        self.assertEqual(len(data['results']), 7)
+        self.assertEqual({post['group'] for post in data['results']},
+                         {'group'})
+        _, data = self.get('profile_posts', 'author', limit=20)
+        self.assertEqual(len(data['results']), 15)
+        response, data = self.get('group_posts', 'missing')
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('detail', data)
+
+    def test_post_detail_and_comments(self):
+        post = self.posts[0]
+        _, data = self.get('post_detail', post.pk)
+        self.assertEqual(data['author'], 'author')
+        self.assertEqual(data['comments_count'], 3)
+        _, data = self.get('post_comments', post.pk, limit=2)
+        self.assertEqual(
+            [comment['text'] for comment in data['results']],
+            ['Комментарий 0', 'Комментарий 1'],
+        )
+        _, data = self.get('post_comments', post.pk, after=data['next'])
+        self.assertEqual(len(data['results']), 1)
+        response, _ = self.get('post_detail', 0)
+        self.assertEqual(response.status_code, 404)
+
+    def test_follow_requires_login(self):
+        response, _ = self.get('follow_posts')
+        self.assertEqual(response.status_code, 401)
+        self.client.force_login(self.reader)
+        _, data = self.get('follow_posts', limit=20)
+        self.assertEqual(len(data['results']), 15)
@@ -0,0 +1,94 @@
+import asyncio
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import Http404
+from django.test import RequestFactory, TransactionTestCase
+
+from posts import async_views
+from posts.models import Comment, Group, Post, User
+
+
+class AsyncViewsTest(TransactionTestCase):
+    """Запросы идут из других потоков, поэтому данные нужны в базе,
+    а не в транзакции теста."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(
+                author=self.author, group=self.group, text='Пост %s' % i
+            )
+            for i in range(13)
+        ]
+        Comment.objects.create(
+            post=self.posts[0], author=self.author, text='Комментарий'
+        )
+
+    def get(self, view, path='/', headers=None, **kwargs):
+        request = RequestFactory().get(path, **(headers or {}))
+        request.user = AnonymousUser()
+        return asyncio.run(view(request, **kwargs))
+
+    def test_index_pages(self):
+        """Страница и число страниц как у синхронной ленты."""
+        content = self.get(async_views.index).content.decode()
+        self.assertIn('Пост 12', content)
+        self.assertNotIn('Пост 2<', content)
+        content = self.get(async_views.index, '/?page=2').content.decode()
+        self.assertIn('Пост 2', content)
+        self.assertNotIn('Пост 12', content)
+        last = self.get(async_views.index, '/?page=99').content.decode()
+        self.assertEqual(last, content)
+
+    def test_bad_page_numbers(self):
+        """Огромный номер — последняя страница, не число — первая."""
+        first = self.get(async_views.index).content.decode()
+        last = self.get(async_views.index, '/?page=2').content.decode()
+        huge = self.get(
+            async_views.index, '/?page=100000000000000000000'
+        ).content.decode()
+        self.assertEqual(huge, last)
+        for number in ('abc', '0', '-1'):
+            with self.subTest(number=number):
+                content = self.get(
+                    async_views.index, '/?page=%s' % number
+                ).content.decode()
+                self.assertEqual(content, first if number == 'abc' else last)
+        profile = self.get(
+            async_views.profile, '/?page=100000000000000000000',
+            username='author',
+        )
+        self.assertContains(profile, 'Пост 2')
+
+    def test_group_and_profile(self):
+        response = self.get(async_views.group_posts, slug='group')
+        self.assertContains(response, 'Группа')
+        self.assertContains(response, 'Пост 12')
+        response = self.get(async_views.profile, username='author')
+        self.assertContains(response, 'Пост 12')
+        with self.assertRaises(Http404):
+            self.get(async_views.group_posts, slug='missing')
+        with self.assertRaises(Http404):
+            self.get(async_views.profile, username='missing')
+
+    def test_post_detail(self):
+        response = self.get(async_views.post_detail, post_id=self.posts[0].pk)
+        self.assertContains(response, 'Пост 0')
+        self.assertContains(response, 'Комментарий')
+        with self.assertRaises(Http404):
+            self.get(async_views.post_detail, post_id=0)
+
+    def test_not_modified(self):
+        """ETag проверяется до выборки страницы."""
+        response = self.get(async_views.post_detail, post_id=self.posts[0].pk)
+        response = self.get(
+            async_views.post_detail,
+            headers={'HTTP_IF_NONE_MATCH': response['ETag']},
+            post_id=self.posts[0].pk,
+        )
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,42 @@
+from django.test import LiveServerTestCase, TestCase
+
+from posts import benchmark
+from posts.models import UserStats
+
+
+class BenchmarkTest(TestCase):
+    def test_seed_and_run(self):
+        """Наполнение пересчитывает счётчики, прогон даёт сводку."""
+        benchmark.seed(users=5, groups=2, posts=30, comments=20, follows=6)
+        self.assertEqual(benchmark.dataset(), {
+            'users': 5, 'groups': 2, 'posts': 30, 'comments': 20,
+            'follows': 6,
+        })
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)), 30
+        )
+        results = benchmark.run(requests=3, warmup=1)
+        self.assertEqual(set(results), {
+            'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+        })
+        for result in results.values():
+            self.assertEqual(result['requests'], 3)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertGreater(result['bytes_mean'], 0)
+
+
+class HttpBenchmarkTest(LiveServerTestCase):
+    def test_run_http(self):
+        """Нагрузка по HTTP из нескольких соединений на живой сервер."""
+        benchmark.seed(users=3, groups=1, posts=15, comments=5, follows=2)
+        results = benchmark.run_http(
+            self.live_server_url, requests=8, connections=4, warmup=0,
+        )
+        self.assertEqual(
+            set(results), {'index', 'group_posts', 'profile', 'post_detail'}
+        )
+        for result in results.values():
+            self.assertEqual(result['requests'], 8)
+            self.assertEqual(result['connections'], 4)
+            self.assertEqual(result['errors'], 0)
+            self.assertGreater(result['rps'], 0)
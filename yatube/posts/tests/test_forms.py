@@ -10,6 +10,10 @@ from posts.models import Post, Group, Comment
 
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
+
+from PIL import Image
 
 User = get_user_model()
 
@@ -143,3 +147,83 @@ class PostFormsTests(TestCase):
         latest_comment = Comment.objects.get(pk=self.post.id)
         self.assertEqual(latest_comment.text, form_data['text'])
         self.assertEqual(latest_comment.author.username, form_data['author'])
+
+
+def make_upload(name='photo.jpg', size=(40, 20), image_format='JPEG',
+                exif=None):
+    buffer = BytesIO()
+    image = Image.new('RGB', size, (10, 120, 200))
+    image.save(buffer, image_format, **({'exif': exif} if exif else {}))
+    return SimpleUploadedFile(
+        name, buffer.getvalue(), 'image/%s' % image_format.lower()
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=True)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def post_image(self, image):
+        return self.client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': image},
+        )
+
+    @override_settings(POST_IMAGE_MAX_BYTES=1024)
+    def test_too_large_file_rejected(self):
+        """Файл больше лимита в байтах отбрасывается с ошибкой в форме."""
+        noise = Image.effect_noise((100, 100), 100).convert('RGB')
+        buffer = BytesIO()
+        noise.save(buffer, 'PNG')
+        response = self.post_image(SimpleUploadedFile(
+            'big.png', buffer.getvalue(), 'image/png'
+        ))
+        self.assertEqual(response.status_code, OK)
+        self.assertIn('image', response.context['form'].errors)
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        """Картинка больше лимита в пикселях отбрасывается по заголовку."""
+        response = self.post_image(make_upload(size=(20, 20)))
+        self.assertIn('image', response.context['form'].errors)
+        self.assertFalse(Post.objects.exists())
+
+    def test_exif_stripped(self):
+        """EXIF вырезается, а поворот из него применяется к картинке."""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: повернуть на 90°
+        exif[0x010F] = 'Camera'
+        self.post_image(make_upload(exif=exif.tobytes()))
+        post = Post.objects.get()
+        with post.image.open() as image:
+            image = Image.open(image)
+            self.assertEqual(image.size, (20, 40))
+            self.assertFalse(image.getexif())
+
+    @override_settings(TASKS_EAGER=False)
+    def test_exif_kept_when_format_not_writable(self):
+        """Если Pillow не может записать формат, файл сохраняется как был."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        upload = make_upload(exif=exif.tobytes())
+        with mock.patch.object(
+            Image.Image, 'save', side_effect=OSError('cannot write')
+        ):
+            response = self.post_image(upload)
+        self.assertEqual(response.status_code, 302)
+        post = Post.objects.get()
+        with post.image.open() as image:
+            self.assertTrue(Image.open(image).getexif())
@@ -0,0 +1,177 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from PIL import Image
+
+from posts.images import generate_images, supported_formats
+from posts.models import Post
+from posts.templatetags.post_images import (
+    image_sources, thumbnail_url
+)
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='image.png', size=(1200, 600), color=(200, 30, 30)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+# миниатюры здесь строятся вызовом generate_images, а не из очереди
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=False)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='photographer')
+        self.post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+
+    def test_generate_thumbnails(self):
+        """Миниатюра строится заранее, шаблон берёт её путь из поста."""
+        self.assertEqual(
+            thumbnail_url(self.post, '960x339'), self.post.image.url
+        )
+        generate_images(self.post.pk, self.post.image.name)
+        post = Post.objects.get(pk=self.post.pk)
+        name = post.thumbnail_names['960x339']
+        with post.image.storage.open(name) as thumb:
+            self.assertEqual(Image.open(thumb).size, (960, 339))
+        self.assertEqual(
+            thumbnail_url(post, '960x339'), post.image.storage.url(name)
+        )
+
+    def test_same_stem_in_two_posts(self):
+        """Картинки с одним именем у разных постов не делят миниатюры."""
+        blue = (30, 30, 200)
+        other = Post.objects.create(
+            author=self.user, text='Другой пост',
+            image=make_image('image.jpg', color=blue),
+        )
+        generate_images(self.post.pk, self.post.image.name)
+        generate_images(other.pk, other.image.name)
+        post = Post.objects.get(pk=self.post.pk)
+        other = Post.objects.get(pk=other.pk)
+        name = post.thumbnail_names['960x339']
+        self.assertNotEqual(name, other.thumbnail_names['960x339'])
+        with post.image.storage.open(name) as thumb:
+            red, _, blue_part = Image.open(thumb).getpixel((10, 10))
+        self.assertGreater(red, blue_part)
+
+    def test_same_stem_variants(self):
+        """Варианты для srcset тоже не пересекаются между постами."""
+        other = Post.objects.create(
+            author=self.user, text='Другой пост',
+            image=make_image('image.jpg', color=(30, 30, 200)),
+        )
+        generate_images(self.post.pk, self.post.image.name)
+        generate_images(other.pk, other.image.name)
+        variants = Post.objects.get(
+            pk=self.post.pk
+        ).thumbnail_names['variants']
+        other_variants = Post.objects.get(
+            pk=other.pk
+        ).thumbnail_names['variants']
+        storage = self.post.image.storage
+        for image_format in supported_formats():
+            for width, name in variants[image_format].items():
+                with self.subTest(format=image_format, width=width):
+                    self.assertNotEqual(
+                        name, other_variants[image_format][width]
+                    )
+                    with storage.open(name) as image:
+                        pixel = Image.open(image).convert('RGB').getpixel(
+                            (10, 10)
+                        )
+                    self.assertGreater(pixel[0], pixel[2])
+
+    def test_new_image_drops_old_thumbnails(self):
+        """После замены картинки старые миниатюры не показываются."""
+        generate_images(self.post.pk, self.post.image.name)
+        post = Post.objects.get(pk=self.post.pk)
+        post.image = make_image('other.png')
+        post.save()
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual(post.thumbnail_names, {})
+        self.assertEqual(thumbnail_url(post, '960x339'), post.image.url)
+
+    def test_variants(self):
+        """Варианты строятся по всем ширинам в доступных форматах."""
+        generate_images(self.post.pk, self.post.image.name)
+        post = Post.objects.get(pk=self.post.pk)
+        variants = post.thumbnail_names['variants']
+        self.assertEqual(list(variants), supported_formats())
+        self.assertIn('jpeg', variants)
+        name = variants['webp']['640']
+        with post.image.storage.open(name) as image:
+            image = Image.open(image)
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (640, 226))
+        sources = dict(image_sources(post))
+        self.assertIn(
+            '%s 640w' % post.image.storage.url(name), sources['image/webp']
+        )
+
+    def test_post_page_srcset(self):
+        """Страница поста отдаёт <picture> с srcset и sizes."""
+        generate_images(self.post.pk, self.post.image.name)
+        response = Client().get('/posts/%s/' % self.post.pk)
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, 'sizes="%s"' % settings.POST_IMAGE_SIZES)
+        self.assertContains(response, ' 960w')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=True)
+class ThumbnailsOnSaveTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_saving_post_queues_thumbnails(self):
+        """Сохранение поста с картинкой ставит миниатюры в очередь."""
+        user = User.objects.create_user(username='photographer')
+        post = Post.objects.create(
+            author=user, text='Пост', image=make_image()
+        )
+        post = Post.objects.get(pk=post.pk)
+        self.assertIn('960x339', post.thumbnail_names)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=True)
+class BuildPostImagesCommandTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_backfill_in_process_pool(self):
+        """Команда достраивает картинки старых постов в пуле процессов."""
+        user = User.objects.create_user(username='photographer')
+        post = Post.objects.create(
+            author=user, text='Пост', image=make_image()
+        )
+        Post.objects.filter(pk=post.pk).update(thumbnails='')
+        out = StringIO()
+        call_command(
+            'build_post_images', '--missing', '--workers=2', stdout=out
+        )
+        self.assertIn('Обновлено постов: 1.', out.getvalue())
+        post = Post.objects.get(pk=post.pk)
+        self.assertIn('960x339', post.thumbnail_names)
+        self.assertIn('320', post.thumbnail_names['variants']['jpeg'])
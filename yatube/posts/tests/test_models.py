@@ -1,7 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -26,3 +26,17 @@ class PostModelTest(TestCase):
         post = PostModelTest.post
         string = post.text[:15]
         self.assertEqual(string, str(post))
+
+    def test_feed_indexes(self):
+        """Для запросов лент объявлены составные индексы."""
+        expected = {
+            Post: [['author', '-pub_date'], ['group', '-pub_date'],
+                   ['-pub_date', '-id']],
+            Comment: [['post', 'created', 'id']],
+            Follow: [['author', 'user']],
+        }
+        for model, fields_list in expected.items():
+            declared = [index.fields for index in model._meta.indexes]
+            for fields in fields_list:
+                with self.subTest(model=model.__name__, fields=fields):
+                    self.assertIn(fields, declared)
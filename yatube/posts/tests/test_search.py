@@ -0,0 +1,87 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Post
+from posts.stemmer import stem
+
+User = get_user_model()
+
+
+class StemmerTest(TestCase):
+    def test_russian_forms(self):
+        """Формы одного слова сводятся к одной основе."""
+        self.assertEqual(stem('котики'), stem('котиков'))
+        self.assertEqual(stem('Красивая'), stem('красивые'))
+        self.assertEqual(stem('ёлки'), stem('елка'))
+        self.assertEqual(stem('python'), 'python')
+
+
+@override_settings(TASKS_EAGER=True)
+class SearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer')
+        self.cats = Post.objects.create(
+            author=self.user, text='Мои котики спят на диване'
+        )
+        self.dogs = Post.objects.create(
+            author=self.user, text='Собака гуляет в парке'
+        )
+
+    def test_word_forms_found(self):
+        """Поиск находит посты по другим формам слов."""
+        self.assertEqual(list(search.search('котик')), [self.cats])
+        self.assertEqual(list(search.search('собаки гуляли')), [self.dogs])
+        self.assertEqual(list(search.search('котик парк')), [])
+        self.assertEqual(list(search.search('  ')), [])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке поста и комментариях."""
+        self.dogs.text = 'Собака спит'
+        self.dogs.save()
+        self.assertEqual(list(search.search('парк')), [])
+        comment = Comment.objects.create(
+            post=self.dogs, author=self.user, text='Какой смешной щенок'
+        )
+        self.assertEqual(list(search.search('смешные')), [self.dogs])
+        comment.delete()
+        self.assertEqual(list(search.search('смешные')), [])
+        self.cats.delete()
+        self.assertEqual(list(search.search('котики')), [])
+
+    def test_rebuild(self):
+        """Команда пересобирает индекс, в том числе для комментариев."""
+        Comment.objects.create(
+            post=self.cats, author=self.user, text='Рыжий кот'
+        )
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Поисковый индекс пересобран.', out.getvalue())
+        self.assertEqual(list(search.search('рыжий')), [self.cats])
+        self.assertEqual(list(search.search('собака')), [self.dogs])
+
+    def test_search_page(self):
+        """Страница поиска показывает найденные посты с пагинацией."""
+        response = Client().get(reverse('posts:search'), {'q': 'котиков'})
+        self.assertEqual(list(response.context['page_obj']), [self.cats])
+        self.assertContains(response, 'котики спят')
+        response = Client().get(reverse('posts:search'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_admin_uses_index(self):
+        """Поиск в админке идёт по тому же индексу."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собаки'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.dogs]
+        )
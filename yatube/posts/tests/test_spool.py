@@ -0,0 +1,82 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import spool
+from posts.models import Comment, Follow, Post, User
+
+SPOOL_DIR = tempfile.mkdtemp()
+
+
+@override_settings(WRITE_BEHIND=True, WRITE_BEHIND_DIR=SPOOL_DIR)
+class WriteBehindTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(SPOOL_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='writer')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_comment_waits_in_spool(self):
+        """Комментарий виден автору сразу, в базе — после drain()."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Отложенный'}, follow=True,
+        )
+        self.assertFalse(Comment.objects.exists())
+        self.assertContains(response, 'Отложенный')
+        self.assertContains(response, 'ожидает публикации')
+        self.assertNotContains(Client().get(url), 'Отложенный')
+
+        self.assertEqual(spool.drain(), 1)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.author, self.user)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        response = self.client.get(url)
+        self.assertContains(response, 'Отложенный', count=1)
+        self.assertNotContains(response, 'ожидает публикации')
+        self.assertEqual(spool.drain(), 0)
+
+    def test_reapplied_batch_skips_comments(self):
+        """Пачка, применённая повторно после сбоя, не дублирует записи."""
+        record = {
+            'type': 'comment', 'post_id': self.post.pk,
+            'author_id': self.user.pk, 'text': 'Один раз',
+            'created': '2026-01-02T03:04:05.123456+00:00',
+        }
+        spool.apply([record])
+        spool.apply([record])
+        comment = Comment.objects.get()
+        self.assertEqual(comment.created.isoformat(), record['created'])
+
+    def test_follow_and_unfollow(self):
+        self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'writer'})
+        )
+        self.assertFalse(Follow.objects.exists())
+        profile = reverse('posts:profile', kwargs={'username': 'writer'})
+        self.assertContains(self.client.get(profile), 'Отписаться')
+        # лента подписок догоняет очередь, чтобы показать новые посты
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertTrue(Follow.objects.filter(
+            user=self.user, author=self.author
+        ).exists())
+        self.assertIn(self.post, response.context['page_obj'])
+
+        self.client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'writer'})
+        )
+        self.assertContains(self.client.get(profile), 'Подписаться')
+        spool.drain()
+        self.assertFalse(Follow.objects.exists())
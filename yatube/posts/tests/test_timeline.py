@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+@override_settings(
+    FOLLOW_TIMELINE=True, FOLLOW_TIMELINE_FANOUT_LIMIT=1, TASKS_EAGER=True
+)
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other_reader = User.objects.create_user(username='other')
+        cls.author = User.objects.create_user(username='author')
+        cls.celebrity = User.objects.create_user(username='celebrity')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_post_fans_out(self):
+        """Подписка переносит старые посты, новый пост попадает в ленту."""
+        old_post = Post.objects.create(author=self.author, text='Старый')
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'author'})
+        )
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+        self.assertEqual(self.feed(), [new_post, old_post])
+
+    def test_unfollow_trims_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.author, text='Текст')
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'author'})
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(self.feed(), [])
+
+    def test_celebrity_posts_are_read_on_demand(self):
+        """Посты популярного автора не раскладываются, но видны в ленте."""
+        Follow.objects.create(user=self.other_reader, author=self.celebrity)
+        Follow.objects.create(user=self.reader, author=self.celebrity)
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.celebrity, text='Звезда')
+        author_post = Post.objects.create(author=self.author, text='Автор')
+        self.assertFalse(TimelineEntry.objects.filter(post=post))
+        self.assertEqual(self.feed(), [author_post, post])
+
+    def test_former_celebrity_posts_stay_in_feed(self):
+        """Посты, не разложенные у популярного автора, не пропадают из
+        ленты, когда подписчиков снова становится меньше лимита."""
+        Follow.objects.create(user=self.other_reader, author=self.celebrity)
+        Follow.objects.create(user=self.reader, author=self.celebrity)
+        post = Post.objects.create(author=self.celebrity, text='Звезда')
+        Follow.objects.get(
+            user=self.other_reader, author=self.celebrity
+        ).delete()
+        self.assertEqual(self.feed(), [post])
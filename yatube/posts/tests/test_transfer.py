@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts import search
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+KINDS = ('groups', 'posts', 'comments', 'follows')
+
+
+class TransferTest(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Текст, с "кавычками"'
+        )
+        Post.objects.create(author=self.author, text='Без группы')
+        self.pub_date = timezone.now() - timedelta(days=30)
+        Post.objects.filter(pk=self.post.pk).update(pub_date=self.pub_date)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Отличные котики'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def snapshot(self):
+        return [
+            list(model.objects.order_by('pk').values())
+            for model in (Group, Post, Comment, Follow)
+        ]
+
+    def round_trip(self, extension):
+        before = self.snapshot()
+        paths = {
+            kind: os.path.join(self.dir, '%s.%s' % (kind, extension))
+            for kind in KINDS
+        }
+        for kind, rows in zip(KINDS, before):
+            out = StringIO()
+            call_command('export_data', kind, paths[kind], stdout=out)
+            self.assertIn('Выгружено строк: %s.' % len(rows), out.getvalue())
+        Group.objects.all().delete()
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        for kind, rows in zip(KINDS, before):
+            out = StringIO()
+            call_command(
+                'import_data', kind, paths[kind], '--batch-size=1',
+                stdout=out,
+            )
+            self.assertIn('Загружено строк: %s.' % len(rows), out.getvalue())
+        self.assertEqual(self.snapshot(), before)
+
+    def test_jsonl_round_trip(self):
+        """Выгрузка и загрузка JSONL сохраняют строки и даты."""
+        self.round_trip('jsonl')
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).pub_date, self.pub_date
+        )
+
+    def test_csv_round_trip(self):
+        """То же для CSV, включая пустую группу и кавычки в тексте."""
+        self.round_trip('csv')
+
+    def test_import_rebuilds_derived_data(self):
+        """После загрузки пересчитаны счётчики и поисковый индекс."""
+        self.round_trip('jsonl')
+        stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count), (2, 1)
+        )
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).comments_count, 1
+        )
+        self.assertEqual(list(search.search('котик')), [self.post])
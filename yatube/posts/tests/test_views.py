@@ -1,14 +1,24 @@
+import base64
 from http import HTTPStatus
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.conf import settings
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.core.cache import cache
 
-from posts.models import Group, Post, Follow
+from posts.models import Comment, Group, Post, Follow
+from posts.paginators import page_window
 
 
 User = get_user_model()
 
+# правильный base64, но месяца 99 не бывает
+BAD_DATE_CURSOR = base64.urlsafe_b64encode(
+    b'2020-99-99T00:00:00|1'
+).decode().rstrip('=')
+
 
 class PostPagesTests(TestCase):
     @classmethod
@@ -90,16 +100,24 @@ class PostPagesTests(TestCase):
         self.assertIn(post, response.context['page_obj'].object_list)
 
     def test_cache_index_page(self):
-        """Проверка кеширования главной страницы."""
+        """Главная страница берётся из кеша, пока посты не менялись."""
         response = self.guest_client.get(reverse('posts:index'))
         object1 = response.content
-        self.new_post = Post.objects.create(
+        # обновление в обход сигналов не сбрасывает кеш
+        Post.objects.filter(pk=self.post.pk).update(text='Не попадет в кэш')
+        response_1 = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(object1, response_1.content)
+
+    def test_new_post_resets_index_cache(self):
+        """Новый пост сразу появляется на закешированной главной."""
+        self.guest_client.get(reverse('posts:index'))
+        Post.objects.create(
             author=self.user,
-            text='Текст не попадет в кэш',
+            text='Текст сразу попадет на главную',
             group=self.group,
         )
-        response_1 = self.guest_client.get(reverse('posts:index'))
-        self.assertEqual(object1, response_1.content)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Текст сразу попадет на главную')
 
     def test_follow_pages_available(self):
         urls = [
@@ -120,3 +138,374 @@ class PostPagesTests(TestCase):
         response = self.authorized_client.get(reverse('posts:follow_index'))
         object = response.context.get('page_obj').object_list
         self.assertIn(post, object)
+
+
+@override_settings(POSTS_CURSOR_PAGINATION=True)
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cursor_user')
+        cls.group = Group.objects.create(
+            title='Курсорная группа',
+            description='Описание группы',
+            slug='cursor-slug',
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {i}', group=cls.group)
+            for i in range(13)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages_cover_all_posts(self):
+        """Курсоры ?after= и ?before= листают ленты без пропусков."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.client.get(url).context['page_obj']
+                self.assertEqual(len(first), settings.SHOWED_POSTS)
+                self.assertFalse(first.has_previous())
+                second = self.client.get(
+                    url, {'after': first.next_cursor()}
+                ).context['page_obj']
+                self.assertEqual(len(second), 3)
+                self.assertFalse(second.has_next())
+                back = self.client.get(
+                    url, {'before': second.previous_cursor()}
+                ).context['page_obj']
+                self.assertEqual(list(back), list(first))
+                ids = [post.pk for post in list(first) + list(second)]
+                self.assertEqual(
+                    ids,
+                    list(Post.objects.order_by('-pub_date', '-id')
+                         .values_list('pk', flat=True))
+                )
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор не ломает страницу."""
+        response = self.client.get(reverse('posts:index'), {'after': '%%%'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_impossible_date_cursor_returns_first_page(self):
+        """Курсор с несуществующей датой тоже даёт первую страницу."""
+        for name in ('after', 'before'):
+            with self.subTest(name=name):
+                response = self.client.get(
+                    reverse('posts:index'), {name: BAD_DATE_CURSOR}
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                page = response.context['page_obj']
+                self.assertFalse(page.has_previous())
+                self.assertEqual(len(page), settings.SHOWED_POSTS)
+
+
+class CommentPagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commenter')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        # одинаковое время у всех: порядок держится на id
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Коммент {i}')
+            for i in range(settings.COMMENTS_PER_PAGE + 5)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_first_page_inline_rest_as_fragment(self):
+        """Первая страница на странице поста, остальные — фрагментом."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        first = response.context['comments']
+        self.assertEqual(len(first), settings.COMMENTS_PER_PAGE)
+        self.assertTrue(first.has_next())
+        fragment_url = reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.pk}
+        )
+        self.assertContains(response, 'data-fragment="%s?after=%s"' % (
+            fragment_url, first.next_cursor()
+        ))
+        fragment = self.client.get(
+            fragment_url, {'after': first.next_cursor()}
+        )
+        rest = fragment.context['comments']
+        self.assertEqual(len(rest), 5)
+        self.assertFalse(rest.has_next())
+        self.assertNotContains(fragment, '<html')
+        self.assertNotContains(fragment, 'data-fragment')
+        self.assertEqual(
+            [comment.pk for comment in list(first) + list(rest)],
+            list(Comment.objects.order_by('pk').values_list('pk', flat=True)),
+        )
+
+    def test_bad_cursor_returns_first_comments(self):
+        """Испорченный курсор комментариев — первая страница, не 500."""
+        urls = [
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, {'after': BAD_DATE_CURSOR})
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                comments = response.context['comments']
+                self.assertEqual(len(comments), settings.COMMENTS_PER_PAGE)
+                self.assertFalse(comments.has_previous())
+
+    def test_fragment_of_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class WindowedPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='many_posts')
+        cls.group = Group.objects.create(
+            title='Большая группа',
+            description='Описание группы',
+            slug='big-slug',
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {i}', group=cls.group)
+            for i in range(settings.SHOWED_POSTS * 25)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_window(self):
+        """Ссылки только на крайние страницы и соседние с текущей."""
+        windows = {
+            1: [1, 2, 3, None, 25],
+            4: [1, 2, 3, 4, 5, 6, None, 25],
+            10: [1, None, 8, 9, 10, 11, 12, None, 25],
+            25: [1, None, 23, 24, 25],
+        }
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        for number, window in windows.items():
+            with self.subTest(page=number):
+                response = self.client.get(url, {'page': number})
+                self.assertEqual(
+                    page_window(response.context['page_obj']), window
+                )
+        self.assertNotContains(response, 'page=15')
+        self.assertContains(response, '…')
+
+    @override_settings(PAGE_CACHE=False)
+    def test_count_is_cached_until_feed_changes(self):
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+
+        def counts():
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(url)
+            return sum('COUNT(' in query['sql'] for query in context)
+
+        self.assertEqual(counts(), 1)
+        self.assertEqual(counts(), 0)
+        Post.objects.create(author=self.user, text='Новый', group=self.group)
+        self.assertEqual(counts(), 1)
+        self.assertEqual(
+            self.client.get(url).context['paginator'].count,
+            settings.SHOWED_POSTS * 25 + 1,
+        )
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(
+            username='writer', first_name='Имя', last_name='Фамилия'
+        )
+        cls.group = Group.objects.create(
+            title='Группа',
+            description='Описание группы',
+            slug='queries-slug',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def queries_for(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.get(url)
+        return len(context)
+
+    def test_feed_query_count_does_not_depend_on_posts(self):
+        """Автор и группа постов ленты загружаются одним запросом."""
+        # сессия, пользователь, COUNT и выборка страницы;
+        # у группы ещё запрос самой группы, у профиля — автор вместо COUNT
+        # и проверка подписки
+        urls = {
+            reverse('posts:index'): 4,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 5,
+            reverse('posts:profile', kwargs={'username': self.author}): 5,
+            reverse('posts:follow_index'): 4,
+        }
+        Post.objects.create(author=self.author, text='1', group=self.group)
+        for url, queries in urls.items():
+            with self.subTest(url=url, posts=1):
+                self.assertEqual(self.queries_for(url), queries)
+        Post.objects.bulk_create(
+            Post(author=self.author, text=str(i), group=self.group)
+            for i in range(settings.SHOWED_POSTS - 1)
+        )
+        for url, queries in urls.items():
+            with self.subTest(url=url, posts=settings.SHOWED_POSTS):
+                self.assertEqual(self.queries_for(url), queries)
+
+
+class PostCardsCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='card_author')
+        cls.group = Group.objects.create(
+            title='Группа карточек',
+            description='Описание группы',
+            slug='cards-slug',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Исходный текст', group=cls.group
+        )
+        cls.other_post = Post.objects.create(
+            author=cls.user, text='Другой пост', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_share_cached_cards(self):
+        """Карточка, отрисованная на главной, используется в других лентах."""
+        self.client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).update(text='Обход сигналов')
+        for url in (
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Исходный текст')
+                self.assertNotContains(response, 'Обход сигналов')
+
+    def test_edit_invalidates_only_its_card(self):
+        """Правка поста перерисовывает только его карточку."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.client.get(url)
+        Post.objects.filter(pk=self.other_post.pk).update(text='Из кеша?')
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Отредактированный текст'
+        post.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'Отредактированный текст')
+        self.assertContains(response, 'Другой пост')
+
+    def test_author_and_group_changes_reset_cards(self):
+        """Новое имя автора и адрес группы сразу видны в карточках."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Новое'
+        user.last_name = 'Имя'
+        user.save()
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'new-cards-slug'
+        group.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'Новое Имя')
+        self.assertContains(response, '/group/new-cards-slug/')
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='etag_author')
+        cls.group = Group.objects.create(
+            title='Группа',
+            description='Описание группы',
+            slug='etag-slug',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Текст', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertNotModified(self, url, response):
+        repeated = self.client.get(
+            url,
+            HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+        self.assertEqual(repeated.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertIsNone(repeated.context)
+
+    def test_feeds_return_not_modified(self):
+        """Ленты отвечают 304, пока посты не менялись."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertNotModified(url, response)
+                Post.objects.create(author=self.user, text='Новый пост')
+                changed = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(changed.status_code, HTTPStatus.OK)
+
+    def test_group_and_author_changes_reset_etag(self):
+        """Правка группы или автора меняет ETag страницы группы и профиля,
+        даже если постов у них нет."""
+        group = Group.objects.create(
+            title='Пустая группа', description='Описание', slug='empty'
+        )
+        author = User.objects.create_user(username='no_posts')
+        pages = (
+            (reverse('posts:group_list', kwargs={'slug': 'empty'}), group,
+             'title', 'Новое название'),
+            (reverse('posts:profile', kwargs={'username': 'no_posts'}),
+             author, 'first_name', 'Новое имя'),
+        )
+        for url, instance, field, value in pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                setattr(instance, field, value)
+                instance.save()
+                changed = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertContains(changed, value)
+
+    def test_post_detail_changes_with_comments(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url)
+        self.assertNotModified(url, response)
+        Comment.objects.create(post=self.post, author=self.user, text='Ок')
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, HTTPStatus.OK)
@@ -0,0 +1,120 @@
+"""Лента подписок, собранная при записи (fan-out-on-write).
+
+Новый пост сразу раскладывается по лентам подписчиков автора, поэтому
+follow_index читает готовый список вместо соединения Follow со всеми
+постами. Авторы, у которых подписчиков больше FOLLOW_TIMELINE_FANOUT_LIMIT,
+не раскладываются: их посты подмешиваются при чтении (гибридный режим).
+Раскладка идёт фоновой задачей fan_out_post, а не в запросе автора.
+
+Такой автор помечается UserStats.timeline_pull, и метка остаётся, даже
+когда подписчиков снова становится меньше лимита: иначе посты, которые
+не разложили, пока он был популярен, пропали бы из лент. Снимает метки
+только rebuild(), заново раскладывая посты по лентам.
+
+При подписке в ленту переносятся только последние
+FOLLOW_TIMELINE_BACKFILL постов автора: более старые в ленте подписок
+не видны, их показывает профиль автора.
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from tasks.queue import task
+
+from .caching import bump_feed_version
+from .models import Follow, Post, TimelineEntry, UserStats
+
+
+def is_enabled():
+    return settings.FOLLOW_TIMELINE
+
+
+def is_celebrity(author_id):
+    """Посты автора подмешиваются при чтении, а не раскладываются.
+
+    Ставит автору метку timeline_pull, если подписчиков больше лимита.
+    """
+    stats = UserStats.objects.filter(user_id=author_id)
+    if stats.filter(
+        followers_count__gt=settings.FOLLOW_TIMELINE_FANOUT_LIMIT,
+    ).update(timeline_pull=True):
+        return True
+    return stats.filter(timeline_pull=True).exists()
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    )
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post)
+         for user_id in followers.iterator()),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+@task
+def fan_out_post(post_id):
+    """Фоновая задача: раскладывает пост, если его ещё не удалили."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        fan_out(post)
+        bump_feed_version()
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту последними FOLLOW_TIMELINE_BACKFILL постами
+    автора после подписки."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', flat=True
+    )
+    limit = settings.FOLLOW_TIMELINE_BACKFILL
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=pk)
+         for pk in posts[:limit]),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild():
+    """Пересобирает все ленты по текущим подпискам.
+
+    Метки timeline_pull ставятся заново по текущему числу подписчиков.
+    """
+    TimelineEntry.objects.all().delete()
+    UserStats.objects.update(timeline_pull=False)
+    for follow in Follow.objects.iterator():
+        backfill(follow.user_id, follow.author_id)
+
+
+def feed_for(user):
+    """Посты ленты подписок: готовые записи и посты популярных авторов."""
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    celebrities = Follow.objects.filter(
+        user=user, author__stats__timeline_pull=True
+    ).values('author_id')
+    if not celebrities.exists():
+        return Post.objects.filter(pk__in=entries)
+    return Post.objects.filter(
+        Q(pk__in=entries) | Q(author_id__in=celebrities)
+    )
+
+
+def following_posts(user):
+    """Посты авторов, на которых подписан пользователь."""
+    if is_enabled():
+        return feed_for(user)
+    return Post.objects.filter(author__following__user=user)
@@ -0,0 +1,164 @@
+"""Выгрузка и загрузка групп, постов, комментариев и подписок.
+
+Форматы — JSON Lines и CSV. Строки читаются и пишутся потоком, так что
+память не зависит от объёма: выгрузка идёт через iterator(chunk_size),
+загрузка — пачками bulk_create, каждая в своей транзакции. Связи
+хранятся как id (author_id, group_id, post_id, user_id): пользователи
+должны уже существовать в базе, куда идёт загрузка.
+"""
+import csv
+import json
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import DateTimeField
+from django.utils import timezone
+
+from . import search, timeline
+from .caching import bump_feed_version
+from .counters import rebuild_counters
+from .models import Comment, Follow, Group, Post
+
+KINDS = {
+    'groups': (Group, ('id', 'title', 'slug', 'description')),
+    'posts': (Post, ('id', 'author_id', 'group_id', 'text', 'pub_date',
+                     'edited', 'image')),
+    'comments': (Comment, ('id', 'post_id', 'author_id', 'text',
+                           'created')),
+    'follows': (Follow, ('id', 'user_id', 'author_id')),
+}
+FORMATS = ('jsonl', 'csv')
+
+
+def guess_format(path):
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_rows(kind, chunk_size=2000):
+    """Строки выгрузки: кортежи значений полей KINDS[kind]."""
+    model, fields = KINDS[kind]
+    return model.objects.order_by('pk').values_list(*fields).iterator(
+        chunk_size=chunk_size
+    )
+
+
+def write_rows(file, file_format, fields, rows):
+    """Пишет строки в файл; возвращает их число."""
+    written = 0
+    if file_format == 'csv':
+        writer = csv.writer(file)
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow(
+                ['' if value is None else _plain(value) for value in row]
+            )
+            written += 1
+        return written
+    for row in rows:
+        file.write(json.dumps(
+            dict(zip(fields, map(_plain, row))), ensure_ascii=False
+        ) + '\n')
+        written += 1
+    return written
+
+
+def read_rows(file, file_format):
+    """Словари полей из файла, по одному на строку."""
+    if file_format == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def build_object(model, fields, row):
+    values = {}
+    for name in fields:
+        field = model._meta.get_field(name)
+        value = row.get(name)
+        if value == '' and field.null:
+            value = None
+        if value is None and isinstance(field, DateTimeField):
+            value = timezone.now()
+        values[field.attname] = field.to_python(value)
+    return model(**values)
+
+
+@contextmanager
+def imported_dates(model):
+    """Сохраняет даты из файла вместо auto_now/auto_now_add.
+
+    bulk_create вызывает pre_save, и без этого все посты получили бы
+    дату загрузки. Флаги меняются у полей модели на время загрузки.
+    """
+    changed = []
+    for field in model._meta.concrete_fields:
+        if getattr(field, 'auto_now', False) or getattr(
+            field, 'auto_now_add', False
+        ):
+            changed.append((field, field.auto_now, field.auto_now_add))
+            field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in changed:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def bulk_create_batches(model, objects, batch_size=1000,
+                        ignore_conflicts=False):
+    """bulk_create пачками по batch_size, каждая в своей транзакции.
+
+    batch_size самому bulk_create не передаётся: внутри пачки Django
+    сам учитывает лимиты SQLite на число параметров запроса.
+    """
+    objects = iter(objects)
+    created = 0
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return created
+        with transaction.atomic():
+            model.objects.bulk_create(
+                batch, ignore_conflicts=ignore_conflicts
+            )
+        created += len(batch)
+
+
+def import_rows(kind, rows, batch_size=1000, ignore_conflicts=False):
+    """Загружает строки; возвращает число обработанных."""
+    model, fields = KINDS[kind]
+    with imported_dates(model):
+        return bulk_create_batches(
+            model, (build_object(model, fields, row) for row in rows),
+            batch_size=batch_size, ignore_conflicts=ignore_conflicts,
+        )
+
+
+def reset_sequences(models):
+    """После вставки с явными id двигает последовательности (PostgreSQL)."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def rebuild_derived():
+    """Пересчитывает всё, что обычно ведут сигналы сохранения.
+
+    bulk_create сигналов не шлёт, поэтому после массовой загрузки
+    счётчики, поисковый индекс и ленты подписок собираются заново.
+    """
+    rebuild_counters()
+    search.rebuild()
+    if timeline.is_enabled():
+        timeline.rebuild()
+    bump_feed_version()
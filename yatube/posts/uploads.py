@@ -0,0 +1,132 @@
+"""Приём картинок постов без лишней памяти на запрос.
+
+Файл пишется на диск по частям; размер в байтах и в пикселях
+проверяется прямо во время чтения, по заголовку картинки, так что
+слишком большой файл или «бомба» из миллиардов пикселей отбрасываются,
+не дочитываясь и не декодируясь. EXIF (геометка, модель камеры)
+вырезается одним перекодированием, с учётом поворота из EXIF.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import (
+    SkipFile, TemporaryFileUploadHandler
+)
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+# сколько байт начала файла держать в памяти, чтобы прочитать размеры
+HEADER_LIMIT = 256 * 1024
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """Потоковая загрузка во временный файл с ограничениями из настроек.
+
+    Отброшенные файлы не попадают в request.FILES, а причина
+    записывается в request.upload_errors[имя поля] для формы.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header = b''
+        self.header_checked = False
+        if (self.content_length
+                and self.content_length > settings.POST_IMAGE_MAX_BYTES):
+            self.reject_size()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            self.reject_size()
+        if not self.header_checked:
+            self.header += raw_data[:HEADER_LIMIT - len(self.header)]
+            self.check_header()
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        return strip_exif(super().file_complete(file_size))
+
+    def check_header(self):
+        try:
+            size = read_image_size(BytesIO(self.header))
+        except Image.DecompressionBombError:
+            self.reject_pixels()
+        if size is None:
+            # заголовок ещё не дочитан; дальше лимита не копим —
+            # остальное проверит валидация формы
+            if len(self.header) >= HEADER_LIMIT:
+                self.header_checked = True
+                self.header = b''
+            return
+        self.header_checked = True
+        self.header = b''
+        width, height = size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            self.reject_pixels()
+
+    def reject_size(self):
+        self.reject('Файл больше %s.' % filesizeformat(
+            settings.POST_IMAGE_MAX_BYTES
+        ))
+
+    def reject_pixels(self):
+        self.reject('Картинка больше %s мегапикселей.' % (
+            settings.POST_IMAGE_MAX_PIXELS // 10 ** 6
+        ))
+
+    def reject(self, message):
+        if self.request is not None:
+            if not hasattr(self.request, 'upload_errors'):
+                self.request.upload_errors = {}
+            self.request.upload_errors[self.field_name] = message
+        raise SkipFile(message)
+
+
+def read_image_size(file):
+    """Размеры картинки по заголовку или None, если его не разобрать."""
+    try:
+        with Image.open(file) as image:
+            return image.size
+    except Image.DecompressionBombError:
+        raise
+    except Exception:
+        return None
+
+
+def strip_exif(uploaded):
+    """Возвращает файл без EXIF; поворот из EXIF применяется к пикселям.
+
+    Файлы без EXIF и не картинки возвращаются как есть.
+    """
+    uploaded.seek(0)
+    try:
+        with Image.open(uploaded) as image:
+            if not image.getexif():
+                return uploaded
+            image_format = image.format
+            icc_profile = image.info.get('icc_profile')
+            image = ImageOps.exif_transpose(image)
+    except Exception:
+        return uploaded
+    finally:
+        uploaded.seek(0)
+    cleaned = TemporaryUploadedFile(
+        uploaded.name, uploaded.content_type, 0, uploaded.charset,
+        uploaded.content_type_extra,
+    )
+    options = {'icc_profile': icc_profile} if icc_profile else {}
+    if image_format == 'JPEG':
+        options['quality'] = 90
+    try:
+        # не всё, что Pillow открывает, он умеет записать (например, MPO)
+        image.save(cleaned, image_format, **options)
+        cleaned.size = cleaned.tell()
+        cleaned.seek(0)
+    except Exception:
+        cleaned.close()
+        uploaded.seek(0)
+        return uploaded
+    uploaded.close()
+    return cleaned
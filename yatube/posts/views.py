@@ -1,81 +1,124 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post, Group, User, Follow
-from django.core.paginator import Paginator
+from .models import Post, Group, User, Comment, Follow, get_user_stats
 from .forms import PostForm, CommentForm
+from .paginators import CountedPaginator, CursorPaginator
+from . import search, spool, timeline
+from .caching import (cache_feed_page, feed_cache_context, feed_etag,
+                      feed_last_modified, post_etag, post_last_modified)
+from django.conf import settings
+from django.utils.http import urlencode
 from django.contrib.auth.decorators import login_required
-from yatube.settings import SHOWED_POSTS
-from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
 
 
-@cache_page(20, key_prefix='index_page')
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+@cache_feed_page(key_prefix='index_page')
 def index(request):
-    post_list = Post.objects.all()
+    post_list = Post.objects.select_related('author', 'group')
     # Если порядок сортировки определен в классе Meta модели,
     # запрос будет выглядить так:
     # post_list = Post.objects.all()
     # Показывать по 10 записей на странице.
-    paginator = Paginator(post_list, 10)
-
-    # Из URL извлекаем номер запрошенной страницы - это значение параметра page
-    page_number = request.GET.get('page')
-
-    # Получаем набор записей для страницы с запрошенным номером
-    page_obj = paginator.get_page(page_number)
-    # Отдаем в словаре контекста
-    context = {
-        'page_obj': page_obj,
-    }
+    context = get_page_context(post_list, request, count_key='index')
+    context.update(feed_cache_context())
     return render(request, 'posts/index.html', context)
 
 
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.posts.select_related('author', 'group')
     context = {
         'group': group,
         'posts': posts,
-        'page_obj': page_obj,
     }
+    context.update(get_page_context(
+        posts, request, count_key='group:%s' % slug
+    ))
     return render(request, 'posts/group_list.html', context)
 
 
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    posts_count = author.posts.count()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    posts = author.posts.select_related('author', 'group')
+    stats = get_user_stats(author)
     context = {
-        'page_obj': page_obj,
         'author': author,
-        'posts_count': posts_count,
+        'following': spool.is_following(request.user, author),
+        'posts_count': stats.posts_count,
+        'followers_count': stats.followers_count,
+        'following_count': stats.following_count,
     }
+    context.update(get_page_context(
+        posts, request, count=stats.posts_count
+    ))
     return render(request, 'posts/profile.html', context)
 
 
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
     form = CommentForm()
-    comments = post.comments.select_related('author')
+    comments = get_comments_page(post.pk, request)
     group = post.group
     author = post.author
-    posts_count = author.posts.count()
+    posts_count = get_user_stats(author).posts_count
     context = {
         'post': post,
         'group': group,
         'posts_count': posts_count,
         'form': form,
-        'comments': comments
+        'comments': comments,
+        'pending_comments': spool.pending_comments(request.user, post.pk),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
-def get_page_context(queryset, request):
-    paginator = Paginator(queryset, SHOWED_POSTS)
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
+def post_comments(request, post_id):
+    """Следующая страница комментариев — фрагмент HTML для подгрузки."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': get_comments_page(post_id, request),
+        'pending_comments': spool.pending_comments(request.user, post.pk),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+def get_comments_page(post_id, request):
+    """Комментарии поста по COMMENTS_PER_PAGE, курсор по (created, id)."""
+    ordering = ('created', 'id')
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related(
+            'author'
+        ).order_by(*ordering),
+        settings.COMMENTS_PER_PAGE,
+        ordering=ordering,
+    )
+    return paginator.page_for(after=request.GET.get('after'))
+
+
+def get_page_context(queryset, request, count=None, count_key=None):
+    """Страница ленты; count или count_key избавляют от COUNT(*)."""
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    # Курсорный режим: включён в настройках или клиент сам прислал курсор
+    if settings.POSTS_CURSOR_PAGINATION or after or before:
+        paginator = CursorPaginator(queryset, settings.SHOWED_POSTS)
+        return {
+            'paginator': paginator,
+            'page_number': None,
+            'page_obj': paginator.page_for(after=after, before=before),
+        }
+    paginator = CountedPaginator(
+        queryset, settings.SHOWED_POSTS, count=count, count_key=count_key
+    )
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return {
@@ -89,7 +132,8 @@ def get_page_context(queryset, request):
 def post_create(request):
     form = PostForm(
         request.POST,
-        files=request.FILES or None
+        files=request.FILES or None,
+        upload_errors=getattr(request, 'upload_errors', None),
     )
     if request.method == "POST":
         # создаётся объект формы на основе класса PostForm
@@ -113,7 +157,8 @@ def post_edit(request, post_id):
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
-        instance=post
+        instance=post,
+        upload_errors=getattr(request, 'upload_errors', None),
     )
     if request.method == 'POST':
         if form.is_valid():
@@ -131,7 +176,9 @@ def post_edit(request, post_id):
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
-    if form.is_valid():
+    if form.is_valid() and spool.is_enabled():
+        spool.add_comment(request.user, post, form.cleaned_data['text'])
+    elif form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
@@ -143,20 +190,38 @@ def add_comment(request, post_id):
 def follow_index(request):
     """Информация о текущем пользователе доступна в переменной request.user."""
     user = request.user
-    post = Post.objects.filter(author__following__user=user)
-    page_obj = get_page_context(post, request)
+    spool.catch_up_follows(user)
+    post = timeline.following_posts(user).select_related('author', 'group')
+    page_obj = get_page_context(
+        post, request, count_key='follow:%s' % user.pk
+    )
     context = {
         'post': post,
     }
     context.update(page_obj)
+    context.update(feed_cache_context())
     return render(request, 'posts/follow.html', context)
 
 
+def search_posts(request):
+    """Поиск по текстам постов и комментариев."""
+    query = request.GET.get('q', '').strip()
+    posts = search.search(query).select_related('author', 'group')
+    context = {
+        'query': query,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    context.update(get_page_context(posts, request))
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def profile_follow(request, username):
     """Подписаться на автора."""
     author = get_object_or_404(User, username=username)
-    if request.user != author:
+    if request.user != author and spool.is_enabled():
+        spool.set_following(request.user, author, True)
+    elif request.user != author:
         Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username)
 
@@ -165,6 +230,9 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
-    following = user.follower.filter(author=author)
-    following.delete()
+    if spool.is_enabled():
+        spool.set_following(user, author, False)
+    else:
+        following = user.follower.filter(author=author)
+        following.delete()
     return redirect('posts:follow_index')
@@ -0,0 +1,34 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'status',
+        'attempts',
+        'run_at',
+        'locked_by',
+        'created',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('dedup_key',)
+    actions = ('requeue',)
+
+    def requeue(self, request, queryset):
+        # задачи, которые уже ждёт более новая с тем же ключом, не трогаем
+        waiting = Job.objects.filter(
+            status=Job.QUEUED, dedup_key__isnull=False
+        ).values('dedup_key')
+        queryset.filter(status=Job.FAILED).exclude(
+            dedup_key__in=waiting
+        ).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now()
+        )
+    requeue.short_description = 'Поставить в очередь заново'
+
+
+admin.site.register(Job, JobAdmin)
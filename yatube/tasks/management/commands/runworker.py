@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks import worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет фоновые задачи из очереди (миниатюры, поисковый '
+        'индекс, ленты подписок). Работает, пока его не остановят.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=settings.TASKS_WORKERS,
+                            help='Размер пула.')
+        parser.add_argument('--processes', action='store_true',
+                            help='Пул процессов вместо потоков.')
+        parser.add_argument('--burst', action='store_true',
+                            help='Выйти, когда очередь опустеет.')
+        parser.add_argument('--interval', type=float,
+                            default=settings.TASKS_POLL_INTERVAL,
+                            help='Пауза опроса пустой очереди (секунды).')
+
+    def handle(self, *args, **options):
+        if not settings.CACHE_SHARED:
+            self.stderr.write(self.style.WARNING(
+                'Кеш не общий (CACHE_BACKEND=locmem): веб-процессы не '
+                'увидят сброс лент после задач воркера и покажут старые '
+                'страницы, пока не истечёт FEED_CACHE_TIMEOUT.'
+            ))
+        try:
+            handled = worker.run(
+                workers=options['workers'], processes=options['processes'],
+                burst=options['burst'], interval=options['interval'],
+            )
+        except KeyboardInterrupt:
+            # пул дожидается начатых задач, остальные остаются в очереди
+            return
+        self.stdout.write(self.style.SUCCESS(
+            'Выполнено задач: %s' % handled
+        ))
@@ -0,0 +1,16 @@
+"""Точка входа процессов пула для runworker --processes.
+
+Процессы запускаются через spawn и настраивают Django заново, поэтому
+модели (и tasks.worker вместе с ними) импортируются только после
+django.setup().
+"""
+import django
+
+
+def init():
+    django.setup()
+
+
+def execute(job_id):
+    from .worker import execute_in_pool
+    return execute_in_pool(job_id)
@@ -0,0 +1,90 @@
+"""Очередь фоновых задач в таблице tasks_job.
+
+Задача — обычная функция, помеченная @task; в очередь попадают её
+полное имя и аргументы в JSON, так что аргументами должны быть простые
+значения (id, строки), а не объекты моделей. Задача ставится в той же
+транзакции, что и изменения, которые её породили: откат запроса
+отменяет и её, а воркер видит её только после коммита.
+
+С dedup_key в очереди ждёт не больше одной задачи с этим ключом:
+повторная постановка лишь обновляет аргументы ожидающей. Так сотня
+комментариев подряд к одному посту переиндексирует его один раз.
+
+Выполняет задачи команда runworker (tasks.worker). При TASKS_EAGER
+задачи выполняются сразу, в том же процессе, — для разработки без
+воркера.
+"""
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def task(func):
+    """Разрешает ставить функцию в очередь."""
+    func.is_task = True
+    return func
+
+
+def task_name(func):
+    return '%s.%s' % (func.__module__, func.__qualname__)
+
+
+def resolve(name):
+    """Функция задачи по имени; только помеченные @task."""
+    func = import_string(name)
+    if not getattr(func, 'is_task', False):
+        raise ValueError('%s не помечена как задача' % name)
+    return func
+
+
+def enqueue(func, *args, dedup_key=None, delay=0, **kwargs):
+    """Ставит func(*args, **kwargs) в очередь; возвращает Job.
+
+    При TASKS_EAGER выполняет сразу и возвращает None; ошибка задачи
+    пишется в лог, как у воркера, и не роняет запрос.
+    """
+    name = task_name(func)
+    resolve(name)
+    if settings.TASKS_EAGER:
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception('Задача %s завершилась ошибкой', name)
+        return None
+    fields = {
+        'name': name,
+        'payload': json.dumps({'args': args, 'kwargs': kwargs}),
+        'run_at': timezone.now() + timedelta(seconds=delay),
+    }
+    if dedup_key is not None:
+        job = _refresh_waiting(dedup_key, fields)
+        if job is not None:
+            return job
+    try:
+        with transaction.atomic():
+            return Job.objects.create(
+                dedup_key=dedup_key,
+                max_attempts=settings.TASKS_MAX_ATTEMPTS,
+                **fields
+            )
+    except IntegrityError:
+        if dedup_key is None:
+            raise
+        # такую же задачу только что поставил параллельный запрос
+        return _refresh_waiting(dedup_key, fields)
+
+
+def _refresh_waiting(dedup_key, fields):
+    waiting = Job.objects.filter(dedup_key=dedup_key, status=Job.QUEUED)
+    if waiting.update(**fields):
+        return waiting.first()
+    return None
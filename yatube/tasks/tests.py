@@ -0,0 +1,143 @@
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from posts import search
+from posts.models import Post
+
+from .models import Job
+from .queue import enqueue, task
+from .worker import claim, execute, requeue_stale, run
+
+User = get_user_model()
+
+CALLS = []
+
+
+@task
+def remember(value):
+    CALLS.append(value)
+
+
+@task
+def explode():
+    raise RuntimeError('сбой')
+
+
+def not_a_task():
+    pass
+
+
+@override_settings(TASKS_EAGER=False, TASKS_MAX_ATTEMPTS=2)
+class QueueTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue_stores_job(self):
+        """Задача попадает в таблицу с именем функции и аргументами."""
+        job = enqueue(remember, 1)
+        job = Job.objects.get(pk=job.pk)
+        self.assertEqual(job.name, 'tasks.tests.remember')
+        self.assertEqual(json.loads(job.payload)['args'], [1])
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(CALLS, [])
+
+    def test_only_marked_functions(self):
+        """Функцию без @task поставить нельзя."""
+        with self.assertRaises(ValueError):
+            enqueue(not_a_task)
+
+    def test_dedup_key(self):
+        """Повторная задача с тем же ключом обновляет ожидающую."""
+        enqueue(remember, 1, dedup_key='same')
+        enqueue(remember, 2, dedup_key='same')
+        job = Job.objects.get()
+        self.assertEqual(json.loads(job.payload)['args'], [2])
+
+    def test_dedup_key_running_job(self):
+        """Пока задача выполняется, новая с тем же ключом ставится рядом."""
+        enqueue(remember, 1, dedup_key='same')
+        claim('test', 1)
+        enqueue(remember, 2, dedup_key='same')
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_claim_is_exclusive(self):
+        """Взятую задачу второй воркер не получит, отложенную — тоже."""
+        job = enqueue(remember, 1)
+        enqueue(remember, 2, delay=60)
+        self.assertEqual(claim('first', 10), [job.pk])
+        self.assertEqual(claim('second', 10), [])
+
+    def test_execute_deletes_done_job(self):
+        """Выполненная задача удаляется из очереди."""
+        job = enqueue(remember, 1)
+        claim('test', 1)
+        self.assertTrue(execute(job.pk))
+        self.assertEqual(CALLS, [1])
+        self.assertFalse(Job.objects.exists())
+
+    def test_retry_then_fail(self):
+        """Упавшая задача повторяется позже, а после лимита — failed."""
+        job = enqueue(explode)
+        claim('test', 1)
+        self.assertFalse(execute(job.pk))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('RuntimeError', job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        claim('test', 1)
+        execute(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_requeue_stale(self):
+        """Задача упавшего воркера возвращается в очередь."""
+        job = enqueue(remember, 1)
+        claim('dead', 1)
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - timedelta(days=1)
+        )
+        requeue_stale()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.locked_by, '')
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager(self):
+        """При TASKS_EAGER задача выполняется сразу, ошибка не падает."""
+        self.assertIsNone(enqueue(remember, 1))
+        enqueue(explode)
+        self.assertEqual(CALLS, [1])
+        self.assertFalse(Job.objects.exists())
+
+
+@override_settings(TASKS_EAGER=False)
+class WorkerTest(TransactionTestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_run_burst(self):
+        """Воркер выполняет все готовые задачи в пуле и выходит."""
+        for value in range(5):
+            enqueue(remember, value)
+        self.assertEqual(run(workers=2, burst=True, interval=0.01), 5)
+        self.assertEqual(sorted(CALLS), list(range(5)))
+        self.assertFalse(Job.objects.exists())
+
+    def test_post_side_effects_in_worker(self):
+        """Сохранение поста только ставит задачи, индекс строит runworker."""
+        user = User.objects.create_user(username='writer')
+        post = Post.objects.create(author=user, text='Пушистые котики')
+        self.assertTrue(Job.objects.filter(
+            dedup_key='search:%s' % post.pk
+        ).exists())
+        self.assertNotIn(post, search.search('котики'))
+        call_command('runworker', '--burst', '--workers=1', stdout=StringIO())
+        self.assertIn(post, search.search('котики'))
@@ -0,0 +1,151 @@
+"""Выполнение задач из очереди (команда runworker).
+
+Воркер забирает готовые задачи по одной атомарным UPDATE ... WHERE
+status = 'queued', поэтому несколько воркеров на одной базе не возьмут
+одну задачу дважды. Задачи выполняются в пуле потоков или процессов;
+удачные удаляются из таблицы, неудачные ставятся снова через
+TASKS_RETRY_DELAY секунд (задержка удваивается с каждой попыткой), а
+после TASKS_MAX_ATTEMPTS остаются со статусом failed — их видно в
+админке. Задачи воркера, который упал посреди работы, возвращаются в
+очередь через TASKS_LOCK_TIMEOUT секунд.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import time
+import traceback
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import process
+from .models import Job
+from .queue import resolve
+
+logger = logging.getLogger(__name__)
+
+
+def worker_name():
+    return '%s:%s' % (socket.gethostname(), os.getpid())
+
+
+def claim(worker, limit):
+    """Забирает до limit готовых задач; возвращает их id."""
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=now
+    ).order_by('run_at', 'pk').values_list('pk', flat=True)[:limit]
+    claimed = []
+    for pk in candidates:
+        taken = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker, locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if taken:
+            claimed.append(pk)
+    return claimed
+
+
+def fail(job, error):
+    """Ставит задачу на повтор или, если попытки кончились, в failed."""
+    if job.attempts >= job.max_attempts:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, last_error=error, locked_by='',
+            locked_at=None,
+        )
+        logger.error('Задача %s не выполнена: %s', job, error)
+        return
+    delay = settings.TASKS_RETRY_DELAY * 2 ** max(job.attempts - 1, 0)
+    try:
+        with transaction.atomic():
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED, last_error=error, locked_by='',
+                locked_at=None,
+                run_at=timezone.now() + timedelta(seconds=delay),
+            )
+    except IntegrityError:
+        # ту же работу уже ждёт более новая задача с тем же ключом
+        Job.objects.filter(pk=job.pk).delete()
+
+
+def execute(job_id):
+    """Выполняет взятую задачу; True — удачно."""
+    job = Job.objects.get(pk=job_id)
+    try:
+        payload = json.loads(job.payload)
+        resolve(job.name)(*payload['args'], **payload['kwargs'])
+    except Exception:
+        fail(job, traceback.format_exc())
+        return False
+    job.delete()
+    return True
+
+
+def execute_in_pool(job_id):
+    """execute() в потоке или процессе пула."""
+    try:
+        return execute(job_id)
+    finally:
+        # у потока или процесса пула своё соединение с БД
+        connections.close_all()
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи, зависшие у упавших воркеров."""
+    deadline = timezone.now() - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT)
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=deadline)
+    for job in stale:
+        fail(job, 'Воркер %s не завершил задачу' % job.locked_by)
+
+
+def make_pool(workers, processes=False):
+    if processes:
+        return ProcessPoolExecutor(
+            max_workers=workers, initializer=process.init,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix='tasks'
+    )
+
+
+def run(workers=2, processes=False, burst=False, interval=None, stop=None):
+    """Выполняет задачи, пока не выставят stop (threading.Event).
+
+    burst — выйти, как только очередь опустеет. Возвращает число
+    выполненных задач, удачных и нет.
+    """
+    interval = settings.TASKS_POLL_INTERVAL if interval is None else interval
+    worker = worker_name()
+    target = process.execute if processes else execute_in_pool
+    running = set()
+    handled = 0
+    with make_pool(workers, processes) as pool:
+        while stop is None or not stop.is_set():
+            finished = {future for future in running if future.done()}
+            for future in finished:
+                handled += 1
+                error = future.exception()
+                if error is not None:
+                    logger.error('Сбой выполнения задачи', exc_info=error)
+            running -= finished
+            requeue_stale()
+            claimed = claim(worker, workers - len(running))
+            running.update(pool.submit(target, pk) for pk in claimed)
+            if claimed:
+                continue
+            if running:
+                wait(running, timeout=interval, return_when=FIRST_COMPLETED)
+            elif burst:
+                break
+            else:
+                time.sleep(interval)
+        wait(running)
+    return handled + len(running)
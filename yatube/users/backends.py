@@ -0,0 +1,40 @@
+"""Загрузка пользователя из кеша, а не из БД на каждый запрос.
+
+AuthenticationMiddleware достаёт пользователя сессии при каждом
+обращении к request.user, а шапка сайта обращается к нему на каждой
+странице. CachedModelBackend хранит пользователя в кеше по id
+USER_CACHE_TIMEOUT секунд; при сохранении и удалении пользователя запись
+сбрасывается (users.signals).
+
+Сброс виден всем воркерам только при общем кеше, поэтому бэкенд
+подключается лишь с ним (CACHE_SHARED): тогда смена пароля или
+блокировка действуют со следующего запроса, а в tiered — не позже чем
+через CACHE_L1_TIMEOUT секунд.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+User = get_user_model()
+
+
+def user_cache_key(user_id):
+    return 'users:user:%s' % user_id
+
+
+def forget_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = User._default_manager.get(pk=user_id)
+            except User.DoesNotExist:
+                return None
+            cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
@@ -1,3 +1,55 @@
-# from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
 
-# # Create your tests here.
+from .backends import CachedModelBackend
+
+User = get_user_model()
+
+
+@override_settings(
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    AUTHENTICATION_BACKENDS=['users.backends.CachedModelBackend'],
+)
+class CachedAuthTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='reader', password='old-password-123'
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_page_without_auth_queries(self):
+        """Сессия и пользователь берутся из кеша, без запросов к БД."""
+        url = reverse('about:author')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertTrue(response.context['user'].is_authenticated)
+
+    def test_save_resets_cached_user(self):
+        """После сохранения пользователь читается заново."""
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        self.user.first_name = 'Имя'
+        self.user.save()
+        self.assertEqual(backend.get_user(self.user.pk).first_name, 'Имя')
+
+    def test_password_change_logs_out(self):
+        """Смена пароля сразу завершает старые сессии."""
+        url = reverse('about:author')
+        self.client.get(url)
+        self.user.set_password('new-password-456')
+        self.user.save()
+        response = self.client.get(url)
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_deleted_user(self):
+        """Удалённый пользователь не загружается из кеша."""
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        user_id = self.user.pk
+        self.user.delete()
+        self.assertIsNone(backend.get_user(user_id))
@@ -0,0 +1,32 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Read-only pages are served by the async views from posts.async_views
+(ASYNC_VIEWS); everything else runs as usual.
+
+Requires Django 3.1+ (see yatube/requirements.txt), e.g.:
+
+    uvicorn yatube.asgi:application --workers 4
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+import django
+from django.core.exceptions import ImproperlyConfigured
+
+if django.VERSION < (3, 1):
+    raise ImproperlyConfigured(
+        'ASGI and async views require Django 3.1+; '
+        'use yatube.wsgi with Django %s.' % django.get_version()
+    )
+
+from django.core.asgi import get_asgi_application  # noqa: E402
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
+
+application = get_asgi_application()
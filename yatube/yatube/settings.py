@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -46,13 +48,16 @@ INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
+    'tasks.apps.TasksConfig',
     'about.apps.AboutConfig',
     'sorl.thumbnail',
     'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.metrics.TimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.pagecache.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -83,16 +88,61 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# Асинхронные версии лент и страницы поста (posts.async_views, Django 3.1+).
+# yatube/asgi.py включает их сам; под WSGI от них нет выигрыша.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', '0') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# База выбирается переменными окружения: DB_ENGINE=postgresql — рабочий
+# профиль, иначе — файл SQLite. Соединения постоянные в обоих профилях:
+# у SQLite новое соединение заново выполняет все SQLITE_PRAGMAS.
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite3')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'yatube'),
+            'USER': os.getenv('POSTGRES_USER', 'yatube'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv(
+                'DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')
+            ),
+            # сколько секунд ждать снятия блокировки записи
+            'OPTIONS': {'timeout': 20},
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            # тестовая база — файл, а не общая память: там блокировки
+            # таблиц не ждут busy_timeout, и воркер runworker в потоках
+            # падает с «database table is locked»
+            'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
+        }
     }
-}
+
+# PRAGMA для каждого нового соединения с SQLite (core.db): WAL позволяет
+# читать во время записи, synchronous=NORMAL в WAL безопасен и не ждёт
+# fsync на каждый коммит. SQLITE_TUNING=0 отключает настройку.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32000,
+} if os.getenv('SQLITE_TUNING', '1') == '1' else {}
+
+# Словарь полнотекстового поиска, если база — PostgreSQL
+SEARCH_POSTGRES_CONFIG = 'russian'
 
 
 # Password validation
@@ -149,16 +199,170 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
 SHOWED_POSTS = 10
+# Очередь фоновых задач (приложение tasks): миниатюры, поисковый индекс
+# и раскладка лент подписок. Задачи выполняет manage.py runworker;
+# при TASKS_EAGER=1 — сразу, в том же запросе. При DEBUG это умолчание,
+# чтобы runserver работал без воркера. Воркер — отдельный процесс:
+# сброшенные им версии лент и страниц увидят веб-процессы только при
+# общем кеше (CACHE_SHARED), иначе ленты устаревают до FEED_CACHE_TIMEOUT.
+TASKS_EAGER = os.getenv('TASKS_EAGER', '1' if DEBUG else '0') == '1'
+TASKS_WORKERS = 2
+TASKS_POLL_INTERVAL = 1
+TASKS_MAX_ATTEMPTS = 3
+# Задержка перед повтором (секунды), удваивается с каждой попыткой
+TASKS_RETRY_DELAY = 10
+# Через сколько секунд задача упавшего воркера вернётся в очередь
+TASKS_LOCK_TIMEOUT = 60 * 10
+
+# Отложенная запись комментариев и подписок (posts.spool): запросы
+# дописывают их в файл очереди, а команда drain_spool применяет пачками.
+WRITE_BEHIND = os.getenv('WRITE_BEHIND', '0') == '1'
+WRITE_BEHIND_DIR = os.getenv(
+    'WRITE_BEHIND_DIR', os.path.join(BASE_DIR, 'spool')
+)
+WRITE_BEHIND_FSYNC = True
+WRITE_BEHIND_BATCH_SIZE = 500
+# Пауза drain_spool, когда очередь пуста (секунды)
+WRITE_BEHIND_INTERVAL = 0.5
+# Сколько автор видит свои ещё не применённые записи
+WRITE_BEHIND_PENDING_TTL = 60 * 60
+
+# Комментариев на странице поста и в каждой подгрузке
+COMMENTS_PER_PAGE = 20
+# Сколько номеров страниц показывать по обе стороны от текущей
+PAGINATOR_WINDOW = 2
+# Курсорная пагинация лент (?after=/?before=) вместо номеров страниц
+POSTS_CURSOR_PAGINATION = False
+# Наибольший размер страницы JSON API (?limit=)
+API_MAX_PAGE_SIZE = 100
+
+# Материализованная лента подписок (fan-out-on-write).
+# Посты авторов, у которых подписчиков больше лимита, подмешиваются
+# при чтении; при подписке в ленту переносятся последние
+# FOLLOW_TIMELINE_BACKFILL постов автора — более старые в ленте не видны.
+FOLLOW_TIMELINE = False
+FOLLOW_TIMELINE_FANOUT_LIMIT = 1000
+FOLLOW_TIMELINE_BACKFILL = 200
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Загрузки пишутся на диск по частям и обрываются, как только файл
+# превысил лимит в байтах или заголовок картинки — лимит в пикселях.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.ImageUploadHandler']
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+
+# Миниатюры строит фоновая задача (см. TASKS_* выше)
+POST_THUMBNAIL_SIZES = ['960x339']
+# Адаптивные варианты для srcset: ширины в пропорциях первой миниатюры
+# и форматы в порядке предпочтения (недоступные Pillow пропускаются).
+POST_IMAGE_VARIANT_WIDTHS = [320, 640, 960]
+POST_IMAGE_VARIANT_FORMATS = ['avif', 'webp', 'jpeg']
+POST_IMAGE_SIZES = '(min-width: 992px) 960px, 100vw'
+
+# Кеш выбирается переменными окружения:
+# CACHE_BACKEND — locmem (по умолчанию), file, redis, tiered
+# или полный путь к классу бэкенда; CACHE_LOCATION — каталог или URL.
+# tiered — L1 в памяти воркера (LRU на CACHE_L1_MAX_ENTRIES ключей,
+# не дольше CACHE_L1_TIMEOUT секунд) поверх общего кеша
+# CACHE_SHARED_BACKEND (file или redis). Для redis нужен django-redis.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django_redis.cache.RedisCache',
+}
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_LOCATION = os.getenv(
+    'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+)
+
+if CACHE_BACKEND == 'tiered':
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.caches.TieredCache',
+            'OPTIONS': {
+                'SHARED_CACHE': 'shared',
+                'MAX_ENTRIES': int(os.getenv('CACHE_L1_MAX_ENTRIES', 1000)),
+                'LOCAL_TIMEOUT': int(os.getenv('CACHE_L1_TIMEOUT', 5)),
+            },
+        },
+        'shared': {
+            'BACKEND': CACHE_BACKENDS[
+                os.getenv('CACHE_SHARED_BACKEND', 'file')
+            ],
+            'LOCATION': CACHE_LOCATION,
+        },
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': CACHE_BACKENDS['locmem'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+            'LOCATION': CACHE_LOCATION,
+        }
     }
+
+# Общий ли кеш для всех процессов. Версии лент и страниц хранятся в
+# кеше: в locmem у каждого воркера своя копия, и сброс в одном воркере
+# не виден остальным, поэтому долгие сроки включаются только с общим.
+CACHE_SHARED = CACHE_BACKEND != 'locmem'
+
+# Ленты кешируются надолго: новый пост сбрасывает их через версию ключа
+FEED_CACHE_TIMEOUT = 60 * 60 * 6 if CACHE_SHARED else 20
+# Отрисованные карточки постов; ключ меняется при правке поста
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Кеш целых страниц для анонимных посетителей (core.pagecache);
+# сбрасывается при изменении моделей PAGE_CACHE_MODELS, при DEBUG выключен.
+PAGE_CACHE = os.getenv('PAGE_CACHE', '1') == '1'
+# без общего кеша сброс из другого процесса (runworker) сюда не дойдёт
+PAGE_CACHE_TIMEOUT = 60 * 60 if CACHE_SHARED else 20
+PAGE_CACHE_MODELS = [
+    'posts.Post', 'posts.Comment', 'posts.Group', 'posts.Follow', 'auth.User',
+]
+PAGE_CACHE_EXCLUDE = ['/admin/', '/metrics/', '/__debug__/']
+
+# Сессии: SESSION_BACKEND=db — только БД, cached_db — чтение из кеша
+# с записью и в БД, signed_cookies — подписанная кука без хранилища.
+# cached_db и кеш пользователей (users.backends) включаются только с
+# общим кешем: в locmem выход из аккаунта, смена пароля или блокировка
+# сбросили бы кеш лишь того воркера, который их обработал.
+SESSION_BACKENDS = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
 }
+SESSION_BACKEND = os.getenv(
+    'SESSION_BACKEND', 'cached_db' if CACHE_SHARED else 'db'
+)
+if SESSION_BACKEND == 'cached_db' and not CACHE_SHARED:
+    raise ImproperlyConfigured(
+        'SESSION_BACKEND=cached_db требует общего кеша (CACHE_BACKEND)'
+    )
+SESSION_ENGINE = SESSION_BACKENDS[SESSION_BACKEND]
+
+AUTHENTICATION_BACKENDS = [
+    'users.backends.CachedModelBackend' if CACHE_SHARED
+    else 'django.contrib.auth.backends.ModelBackend'
+]
+USER_CACHE_TIMEOUT = 60 * 15
 
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Метрики снимаются с доли запросов; /metrics/ отдаётся адресам из
+# METRICS_ALLOWED_IPS и сотрудникам (is_staff). Заголовок Server-Timing
+# видит любой клиент, поэтому вне DEBUG он выключен, пока его не включат
+# METRICS_SERVER_TIMING=1.
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', 0.1))
+METRICS_SERVER_TIMING = os.getenv(
+    'METRICS_SERVER_TIMING', '1' if DEBUG else '0'
+) == '1'
+METRICS_ALLOWED_IPS = INTERNAL_IPS